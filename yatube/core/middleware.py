@@ -0,0 +1,39 @@
+import logging
+
+from django.conf import settings
+
+from .queries import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryBudgetMiddleware:
+    """Считает и замеряет SQL-запросы каждого запроса к сайту.
+    Если view превысила бюджет из settings.QUERY_BUDGETS, пишет
+    предупреждение в лог или, при QUERY_BUDGET_RAISE, падает."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryCounter.for_request(request) as counter:
+            response = self.get_response(request)
+        match = request.resolver_match
+        url_name = match.view_name if match else None
+        budget = settings.QUERY_BUDGETS.get(url_name)
+        # Профилируемый запрос сохраняет результат лишним INSERT.
+        if getattr(request, 'profiled', False):
+            budget = None
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{url_name}: {counter.count} SQL-запросов '
+                f'({counter.duration * 1000:.1f} мс) при бюджете {budget}'
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
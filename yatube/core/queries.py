@@ -0,0 +1,81 @@
+import time
+from contextlib import ContextDecorator, ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryCounter:
+    """Обёртка для connection.execute_wrapper: считает запросы
+    и суммарное время их выполнения. Текст запросов сохраняется
+    только при record=True: в тестах, а не на каждом запросе к сайту."""
+
+    def __init__(self, record=False):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = [] if record else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+            if self.queries is not None:
+                self.queries.append(sql)
+
+    def watch(self):
+        """Подключает счётчик ко всем базам данных проекта."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @classmethod
+    @contextmanager
+    def for_request(cls, request):
+        """Счётчик запроса к сайту. Его подключает первая middleware,
+        остальные берут тот же из request.query_counter, чтобы каждый
+        SQL-запрос не проходил через несколько обёрток."""
+        counter = getattr(request, 'query_counter', None)
+        if counter is not None:
+            yield counter
+            return
+        counter = request.query_counter = cls()
+        with counter.watch():
+            yield counter
+
+
+class query_budget(ContextDecorator):
+    """Падает, если код внутри сделал больше запросов,
+    чем разрешено view url_name в settings.QUERY_BUDGETS.
+
+        with query_budget('posts:index'):
+            self.client.get(reverse('posts:index'))
+    """
+
+    def __init__(self, url_name, budget=None):
+        self.url_name = url_name
+        self.budget = budget
+
+    def __enter__(self):
+        self.counter = QueryCounter(record=True)
+        self.stack = self.counter.watch()
+        self.stack.__enter__()
+        return self.counter
+
+    def __exit__(self, *exc_info):
+        self.stack.__exit__(*exc_info)
+        if exc_info[0] is not None:
+            return False
+        budget = self.budget
+        if budget is None:
+            budget = settings.QUERY_BUDGETS[self.url_name]
+        if self.counter.count > budget:
+            raise AssertionError(
+                f'{self.url_name}: {self.counter.count} запросов '
+                f'при бюджете {budget}:\n'
+                + '\n'.join(self.counter.queries)
+            )
+        return False
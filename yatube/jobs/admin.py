@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'pk', 'name', 'status', 'attempts', 'max_attempts', 'run_at',
+        'created', 'finished')
+    search_fields = ('name',)
+    list_filter = ('status', 'name')
+    actions = ('retry',)
+    # В аргументах бывают личные данные, в админке их не показываем.
+    exclude = ('payload',)
+
+    def retry(self, request, queryset):
+        queryset.update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0,
+            locked_at=None)
+    retry.short_description = 'Запустить заново'
+
+
+admin.site.register(Job, JobAdmin)
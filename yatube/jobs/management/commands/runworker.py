@@ -0,0 +1,124 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs import process, queue
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из очереди jobs в пуле потоков или процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOB_WORKERS,
+            help='Сколько задач выполняется одновременно; '
+                 '0 - по одной в этом же процессе.')
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо потоков, для задач, '
+                 'которые нагружают процессор.')
+        parser.add_argument(
+            '--poll', type=float, default=settings.JOB_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        self.done = self.failed = 0
+        self.purged_at = None
+        try:
+            if options['workers'] > 0:
+                self.run_pool(options)
+            else:
+                self.run_inline(options)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено: {self.done}, с ошибкой: {self.failed}'))
+
+    def stop(self, signum, frame):
+        # Новых задач не берём, начатые доделываем.
+        self.stopping = True
+
+    def purge(self):
+        # Старые завершённые задачи чистим между выборками из очереди.
+        now = time.monotonic()
+        if (self.purged_at is not None
+                and now - self.purged_at < settings.JOB_PURGE_INTERVAL):
+            return
+        self.purged_at = now
+        queue.purge()
+
+    def count(self, status):
+        if status == Job.DONE:
+            self.done += 1
+        else:
+            self.failed += 1
+
+    def run_inline(self, options):
+        while not self.stopping:
+            self.purge()
+            claimed = queue.claim(1)
+            if not claimed:
+                if options['once']:
+                    return
+                time.sleep(options['poll'])
+                continue
+            self.count(queue.perform(claimed[0]))
+
+    def make_pool(self, options):
+        workers = options['workers']
+        if options['processes']:
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.setup,
+            )
+        return ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='job')
+
+    def target(self, options):
+        return process.perform if options['processes'] else queue.perform
+
+    def run_pool(self, options):
+        workers = options['workers']
+        running = set()
+        target = self.target(options)
+        with self.make_pool(options) as pool:
+            while not self.stopping:
+                self.purge()
+                # Берём из очереди ровно столько, сколько свободно мест:
+                # остальные задачи достанутся другим воркерам.
+                claimed = queue.claim(workers - len(running))
+                running |= {pool.submit(target, pk) for pk in claimed}
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll'])
+                    continue
+                finished, running = wait(
+                    running, timeout=options['poll'],
+                    return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self.collect(future)
+            for future in wait(running).done:
+                self.collect(future)
+
+    def collect(self, future):
+        error = future.exception()
+        if error is not None:
+            self.stderr.write(str(error))
+            self.failed += 1
+            return
+        self.count(future.result())
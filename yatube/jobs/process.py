@@ -0,0 +1,14 @@
+"""Точки входа для пула процессов runworker.
+
+Процесс пула импортирует этот модуль до django.setup(),
+поэтому модели и очередь здесь загружаются только внутри функций."""
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def perform(pk):
+    from .queue import perform
+    return perform(pk)
@@ -0,0 +1,139 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def _path(func):
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, delay=0, max_attempts=None, **kwargs):
+    """Ставит вызов func(*args, **kwargs) в очередь.
+    Задача пишется в той же транзакции, что и данные вызывающего кода:
+    воркер не увидит её, пока транзакция не зафиксирована, а при откате
+    она пропадёт вместе с данными. Аргументы должны сериализоваться в JSON.
+    При settings.JOBS_EAGER задача выполняется сразу, без очереди."""
+    name = _path(func)
+    payload = json.dumps({'args': args, 'kwargs': kwargs})
+    if settings.JOBS_EAGER:
+        # Через JSON, чтобы функция получила то же, что и из очереди.
+        data = json.loads(payload)
+        import_string(name)(*data['args'], **data['kwargs'])
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def _abandoned(now):
+    # Задачи в работе, чей воркер, видимо, умер.
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Q(status=Job.RUNNING, locked_at__lt=stale)
+
+
+def _ready(now):
+    # Готовые к запуску задачи и брошенные, у которых остались попытки.
+    return (
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | (_abandoned(now) & Q(attempts__lt=F('max_attempts')))
+    )
+
+
+def claim(limit):
+    """Забирает до limit готовых задач и возвращает их id.
+    Каждая задача переводится в работу условным UPDATE, поэтому
+    несколько воркеров не возьмут одну задачу дважды.
+    Брошенная задача без оставшихся попыток помечается невыполненной:
+    иначе задача, которая роняет сам воркер, брала бы его бесконечно."""
+    now = timezone.now()
+    Job.objects.filter(
+        _abandoned(now), attempts__gte=F('max_attempts')
+    ).update(
+        status=Job.FAILED,
+        locked_at=None,
+        finished=now,
+        last_error='Воркер не завершил задачу за JOB_LOCK_TIMEOUT',
+    )
+    candidates = Job.objects.filter(_ready(now)).order_by('run_at', 'pk')
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        pks = list(candidates.values_list('pk', flat=True)[:limit])
+        claimed = []
+        for pk in pks:
+            taken = Job.objects.filter(_ready(now), pk=pk).update(
+                status=Job.RUNNING,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if taken:
+                claimed.append(pk)
+    return claimed
+
+
+def backoff(attempt):
+    """Пауза перед повтором: растёт вдвое с каждой попыткой."""
+    return settings.JOB_RETRY_BACKOFF * 2 ** (attempt - 1)
+
+
+def perform(pk):
+    """Выполняет взятую в работу задачу.
+    При ошибке задача возвращается в очередь с паузой backoff,
+    пока не кончатся попытки. Функция вызывается и в потоках,
+    и в процессах воркера, поэтому сама следит за соединениями с БД."""
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=pk)
+        data = json.loads(job.payload)
+        try:
+            import_string(job.name)(*data['args'], **data['kwargs'])
+        except Exception:
+            error = traceback.format_exc()
+            if job.attempts < job.max_attempts:
+                status = Job.QUEUED
+                run_at = timezone.now() + timedelta(
+                    seconds=backoff(job.attempts))
+            else:
+                status, run_at = Job.FAILED, job.run_at
+            finished = timezone.now() if status == Job.FAILED else None
+            logger.warning(
+                'Задача %s (%s), попытка %s: %s',
+                job.pk, job.name, job.attempts, error)
+            Job.objects.filter(pk=pk).update(
+                status=status, run_at=run_at, locked_at=None,
+                finished=finished, last_error=error)
+            return status
+        Job.objects.filter(pk=pk).update(
+            status=Job.DONE, locked_at=None, finished=timezone.now())
+        return Job.DONE
+    finally:
+        close_old_connections()
+
+
+def purge():
+    """Удаляет завершённые задачи старше JOB_RETENTION_DAYS и
+    возвращает их число. В аргументах задач бывают личные данные,
+    поэтому выполненные задачи не копятся в БД бессрочно."""
+    border = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(
+        # Задачи, завершённые до появления поля finished.
+        Q(finished__lt=border) | Q(finished=None, created__lt=border),
+        status__in=(Job.DONE, Job.FAILED),
+    ).delete()
+    return deleted
@@ -0,0 +1,138 @@
+import json
+import re
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, enqueue, perform, purge
+
+User = get_user_model()
+
+calls = []
+
+
+def remember(*args, **kwargs):
+    calls.append((args, kwargs))
+
+
+def fail():
+    raise RuntimeError('сломалось')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        call_command('runworker', workers=0, once=True, stdout=StringIO())
+
+    def test_enqueue_and_run(self):
+        """Задача ждёт в очереди и выполняется воркером."""
+        job = enqueue(remember, 1, 'два', key=[3])
+        self.assertEqual(job.name, 'jobs.tests.remember')
+        self.assertEqual(calls, [])
+        self.run_worker()
+        self.assertEqual(calls, [((1, 'два'), {'key': [3]})])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        """При JOBS_EAGER задача выполняется сразу."""
+        self.assertIsNone(enqueue('jobs.tests.remember', 5))
+        self.assertEqual(calls, [((5,), {})])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        """Отложенная задача не берётся раньше срока."""
+        enqueue(remember, delay=60)
+        self.assertEqual(claim(10), [])
+
+    def test_claim_once(self):
+        """Взятую в работу задачу второй воркер не получит."""
+        job = enqueue(remember)
+        self.assertEqual(claim(10), [job.pk])
+        self.assertEqual(claim(10), [])
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_abandoned_job_reclaimed(self):
+        """Задачу умершего воркера снова берут после таймаута."""
+        job = enqueue(remember)
+        claim(10)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(claim(10), [job.pk])
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_abandoned_job_fails_without_attempts(self):
+        """Брошенную задачу без оставшихся попыток больше не берут."""
+        job = enqueue(remember, max_attempts=1)
+        claim(10)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(claim(10), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(job.locked_at)
+
+    @override_settings(JOB_RETRY_BACKOFF=10)
+    def test_retry_with_backoff(self):
+        """Упавшая задача повторяется с растущей паузой,
+        а после последней попытки помечается как невыполненная."""
+        job = enqueue(fail, max_attempts=2)
+        started = timezone.now()
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('сломалось', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=10))
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        claim(1)
+        self.assertEqual(perform(job.pk), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOB_RETENTION_DAYS=7)
+    def test_purge_finished_jobs(self):
+        """Старые завершённые задачи удаляются, свежие и ждущие - нет."""
+        done = enqueue(remember)
+        failed = enqueue(fail, max_attempts=1)
+        self.run_worker()
+        queued = enqueue(remember, delay=60)
+        week_ago = timezone.now() - timedelta(days=8)
+        Job.objects.filter(pk=done.pk).update(finished=week_ago)
+        Job.objects.update(created=week_ago)
+        self.assertEqual(purge(), 1)
+        self.assertEqual(
+            set(Job.objects.values_list('pk', flat=True)),
+            {failed.pk, queued.pk})
+        Job.objects.filter(pk=failed.pk).update(finished=week_ago)
+        self.run_worker()
+        self.assertEqual(list(Job.objects.all()), [queued])
+
+    def test_password_reset_email_queued(self):
+        """Письмо для сброса пароля уходит из воркера, а не из запроса,
+        и ссылка со сбросом не хранится в аргументах задачи."""
+        user = User.objects.create_user(
+            username='forgot', email='forgot@test.ru', password='secret-1')
+        response = self.client.post(
+            '/auth/password_reset/', {'email': 'forgot@test.ru'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get(name='users.tasks.send_password_reset')
+        self.assertEqual(json.loads(job.payload)['args'][0], user.pk)
+        self.assertNotIn('/auth/reset/', job.payload)
+        self.assertNotIn('forgot@test.ru', job.payload)
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['forgot@test.ru'])
+        link = re.search(r'/auth/reset/\S+', mail.outbox[0].body).group()
+        response = self.client.get(link, follow=True)
+        self.assertTrue(response.context['validlink'])
@@ -0,0 +1,74 @@
+"""Бэкенды кэша Django, которые считают попадания и промахи.
+
+    CACHES = {'default': {'BACKEND': 'metrics.cache.LocMemCache'}}
+
+Метка cache - имя кэша в settings.CACHES."""
+import threading
+
+from django.conf import settings
+from django.core.cache.backends import db, filebased, locmem, memcached
+
+from . import registry
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_name = self._alias(location)
+        # get_many базового класса вызывает get: ключ не считается дважды.
+        self._many = threading.local()
+
+    def _alias(self, location):
+        path = f'{type(self).__module__}.{type(self).__name__}'
+        for alias, conf in settings.CACHES.items():
+            if (conf.get('BACKEND') == path
+                    and conf.get('LOCATION', '') == location):
+                return alias
+        return path
+
+    def _count(self, hits, misses):
+        if getattr(self._many, 'active', False):
+            return
+        if hits:
+            registry.CACHE_REQUESTS.inc(
+                hits, cache=self.metrics_name, result='hit')
+        if misses:
+            registry.CACHE_REQUESTS.inc(
+                misses, cache=self.metrics_name, result='miss')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        self._count(value is not _MISSING, value is _MISSING)
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        self._many.active = True
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            self._many.active = False
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(CacheMetricsMixin, filebased.FileBasedCache):
+    pass
+
+
+class DatabaseCache(CacheMetricsMixin, db.DatabaseCache):
+    pass
+
+
+class MemcachedCache(CacheMetricsMixin, memcached.MemcachedCache):
+    pass
+
+
+class PyLibMCCache(CacheMetricsMixin, memcached.PyLibMCCache):
+    pass
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from metrics import store
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы метрик всех процессов из METRICS_DIR. '
+        'Запускается перед стартом воркеров сервера: иначе к новым '
+        'значениям прибавятся значения прошлого запуска.'
+    )
+
+    def handle(self, *args, **options):
+        store.reset()
+        self.stdout.write(f'Метрики в {settings.METRICS_DIR} сброшены')
@@ -0,0 +1,30 @@
+import time
+
+from core.queries import QueryCounter
+
+from . import registry
+
+
+class MetricsMiddleware:
+    """Время ответа, код ответа и SQL-запросы каждого запроса к сайту
+    с разбивкой по имени view. Стоит первой в MIDDLEWARE, чтобы время
+    включало остальные middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with QueryCounter.for_request(request) as counter:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        # Адреса без view сводятся в одно значение, иначе каждый
+        # случайный адрес с ответом 404 заводил бы свои ряды.
+        view = match.view_name if match else 'unmatched'
+        registry.REQUEST_DURATION.observe(duration, view=view)
+        registry.RESPONSES.inc(
+            view=view, method=request.method, status=response.status_code)
+        registry.DB_QUERIES.observe(counter.count, view=view)
+        registry.DB_DURATION.observe(counter.duration, view=view)
+        return response
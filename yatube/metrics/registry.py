@@ -0,0 +1,146 @@
+"""Метрики сайта и их вывод в текстовом формате Prometheus."""
+import json
+import math
+from collections import defaultdict
+
+from . import store
+
+REGISTRY = []
+# Время в секундах: от быстрых ответов из кэша до зависших запросов.
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 20, 50, 100, 200, 500)
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n'))
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, suffix, labels, *extra):
+        values = [str(labels[name]) for name in self.labelnames]
+        return json.dumps([self.name + suffix, values + list(extra)])
+
+    def header(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        store.add((self._key('_total', labels), amount))
+
+    def render(self, samples):
+        lines = self.header()
+        for values, value in sorted(samples.get(self.name + '_total', ())):
+            lines.append(
+                f'{self.name}_total{_labels(self.labelnames, values)} '
+                f'{_number(value)}')
+        return lines
+
+
+class Histogram(Metric):
+    """Хранит число наблюдений в каждом интервале, накопленные
+    значения le считаются при выводе: наблюдение - три записи."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        bucket = next(bound for bound in self.buckets if value <= bound)
+        store.add(
+            (self._key('_bucket', labels, _number(bucket)), 1),
+            (self._key('_sum', labels), value),
+            (self._key('_count', labels), 1),
+        )
+
+    def render(self, samples):
+        lines = self.header()
+        counts = defaultdict(dict)
+        for values, value in samples.get(self.name + '_bucket', ()):
+            counts[tuple(values[:-1])][values[-1]] = value
+        sums = dict(samples.get(self.name + '_sum', ()))
+        for values in sorted(counts):
+            total = 0
+            for bound in self.buckets:
+                total += counts[values].get(_number(bound), 0)
+                labels = _labels(
+                    self.labelnames + ('le',), values + (_number(bound),))
+                lines.append(f'{self.name}_bucket{labels} {_number(total)}')
+            labels = _labels(self.labelnames, values)
+            lines.append(
+                f'{self.name}_sum{labels} {_number(sums.get(values, 0))}')
+            lines.append(f'{self.name}_count{labels} {_number(total)}')
+        return lines
+
+
+def render():
+    samples = defaultdict(list)
+    for key, value in store.collect().items():
+        sample, values = json.loads(key)
+        samples[sample].append((tuple(values), value))
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(samples))
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_DURATION = Histogram(
+    'yatube_http_request_duration_seconds',
+    'Время ответа на запрос, от первой middleware до последней.',
+    ('view',))
+RESPONSES = Counter(
+    'yatube_http_responses',
+    'Ответы по view, методу и коду ответа.',
+    ('view', 'method', 'status'))
+DB_QUERIES = Histogram(
+    'yatube_db_queries_per_request',
+    'Число SQL-запросов за один запрос к сайту.',
+    ('view',), buckets=COUNT_BUCKETS)
+DB_DURATION = Histogram(
+    'yatube_db_query_duration_per_request_seconds',
+    'Суммарное время SQL-запросов за один запрос к сайту.',
+    ('view',))
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests',
+    'Чтения ключей из кэшей Django: result - hit или miss.',
+    ('cache', 'result'))
+PAGE_CACHE_REQUESTS = Counter(
+    'yatube_page_cache_requests',
+    'Обращения к кэшу блоков лент: result - hit или miss.',
+    ('view', 'result'))
+TEMPLATE_RENDER = Histogram(
+    'yatube_template_render_seconds',
+    'Время отрисовки шаблона вместе с вложенными.',
+    ('template',))
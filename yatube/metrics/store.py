@@ -0,0 +1,140 @@
+"""Хранилище значений метрик, общее для процессов-воркеров.
+
+Каждый процесс пишет в свой файл METRICS_DIR/<pid>.db, отображённый
+в память через mmap: прибавить к счётчику - значит переписать восемь
+байт, без системных вызовов и блокировок между процессами. /metrics
+читает все файлы каталога и складывает одноимённые значения.
+Файлы завершившихся процессов остаются, поэтому счётчики не убывают
+при перезапуске воркеров. Каталог очищают командой reset_metrics
+перед запуском всех воркеров сервера.
+
+Формат файла: заголовок из восьми байт (занятый размер), затем
+записи: длина ключа (uint32), ключ в UTF-8 с выравниванием
+до восьми байт, значение (double)."""
+import mmap
+import os
+import struct
+import threading
+from collections import Counter
+
+from django.conf import settings
+
+HEADER = 8
+INITIAL_SIZE = 64 * 1024
+
+
+def _align(size):
+    return (size + 7) // 8 * 8
+
+
+class ProcessFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER:
+            size = INITIAL_SIZE
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = struct.unpack_from('I', self.map)[0] or HEADER
+        self.positions = {
+            key: offset for key, offset, _ in entries(self.map, self.used)}
+
+    def _grow(self):
+        size = len(self.map) * 2
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def _append(self, key):
+        data = key.encode()
+        offset = self.used + _align(4 + len(data))
+        while offset + 8 > len(self.map):
+            self._grow()
+        struct.pack_into(
+            f'I{len(data)}s', self.map, self.used, len(data), data)
+        struct.pack_into('d', self.map, offset, 0.0)
+        # Размер обновляется последним: читатель не увидит
+        # недописанную запись.
+        self.used = offset + 8
+        struct.pack_into('I', self.map, 0, self.used)
+        self.positions[key] = offset
+        return offset
+
+    def add(self, key, amount):
+        offset = self.positions.get(key)
+        if offset is None:
+            offset = self._append(key)
+        value = struct.unpack_from('d', self.map, offset)[0]
+        struct.pack_into('d', self.map, offset, value + amount)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def entries(data, used=None):
+    """(ключ, смещение значения, значение) записей файла."""
+    if used is None:
+        used = struct.unpack_from('I', data)[0]
+    position = HEADER
+    while position < used:
+        length = struct.unpack_from('I', data, position)[0]
+        key = bytes(data[position + 4:position + 4 + length]).decode()
+        offset = position + _align(4 + length)
+        yield key, offset, struct.unpack_from('d', data, offset)[0]
+        position = offset + 8
+
+
+_lock = threading.Lock()
+_file = None
+
+
+def _process_file():
+    """Файл текущего процесса. После fork у потомка другой pid,
+    и он заводит свой файл, а не пишет в файл родителя."""
+    global _file
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.db')
+    if _file is None or _file.path != path:
+        if _file is not None:
+            _file.close()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        _file = ProcessFile(path)
+    return _file
+
+
+def add(*pairs):
+    """Прибавляет значения к ключам: add((ключ, число), ...)."""
+    with _lock:
+        process_file = _process_file()
+        for key, amount in pairs:
+            process_file.add(key, amount)
+
+
+def collect():
+    """Сумма значений по всем процессам: Counter{ключ: значение}."""
+    totals = Counter()
+    if not os.path.isdir(settings.METRICS_DIR):
+        return totals
+    for name in os.listdir(settings.METRICS_DIR):
+        if not name.endswith('.db'):
+            continue
+        with open(os.path.join(settings.METRICS_DIR, name), 'rb') as data:
+            data = data.read()
+        if len(data) < HEADER:
+            continue
+        for key, _, value in entries(data):
+            totals[key] += value
+    return totals
+
+
+def reset():
+    global _file
+    with _lock:
+        if _file is not None:
+            _file.close()
+            _file = None
+        if os.path.isdir(settings.METRICS_DIR):
+            for name in os.listdir(settings.METRICS_DIR):
+                if name.endswith('.db'):
+                    os.remove(os.path.join(settings.METRICS_DIR, name))
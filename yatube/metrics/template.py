@@ -0,0 +1,29 @@
+"""Шаблонный бэкенд Django, который замеряет отрисовку шаблонов.
+
+Замеряются шаблоны, которые отрисовывает бэкенд: render(),
+TemplateResponse, render_to_string. Время {% include %} входит
+во время включающего шаблона."""
+import time
+
+from django.template.backends import django
+
+from . import registry
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            registry.TEMPLATE_RENDER.observe(
+                time.perf_counter() - started,
+                template=self.origin.template_name or '<string>')
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,127 @@
+import multiprocessing
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from . import store
+
+User = get_user_model()
+
+
+def write(count):
+    for _ in range(count):
+        store.add(('shared', 1), ('float', 0.5))
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            METRICS_DIR=directory.name, METRICS_TOKEN='secret')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(store.reset)
+        cache.clear()
+
+
+class StoreTests(MetricsTestCase):
+    def test_processes(self):
+        """Значения процессов складываются, у каждого процесса свой
+        файл, даже если он унаследовал открытый файл родителя."""
+        write(10)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=write, args=(100,)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(store.collect(), {'shared': 210, 'float': 105})
+
+    def test_growth(self):
+        """Файл растёт, а открытый заново файл продолжает счёт."""
+        keys = [f'ключ-{number}' * 10 for number in range(2000)]
+        store.add(*((key, 1) for key in keys))
+        store._file.close()
+        store._file = None
+        store.add(*((key, 2) for key in keys))
+        totals = store.collect()
+        self.assertEqual(len(totals), len(keys))
+        self.assertEqual(set(totals.values()), {3})
+
+    def test_reset(self):
+        write(1)
+        call_command('reset_metrics', stdout=StringIO())
+        self.assertEqual(store.collect(), {})
+
+
+class MetricsEndpointTests(MetricsTestCase):
+    AUTH = {'HTTP_AUTHORIZATION': 'Bearer secret'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+
+    def test_metrics(self):
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'), **self.AUTH)
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        for line in (
+            '# TYPE yatube_http_request_duration_seconds histogram',
+            'yatube_http_responses_total'
+            '{view="posts:index",method="GET",status="200"} 2.0',
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2.0',
+            'yatube_http_request_duration_seconds_count'
+            '{view="posts:index"} 2.0',
+            'yatube_db_queries_per_request_count{view="posts:index"} 2.0',
+            'yatube_page_cache_requests_total'
+            '{view="posts:index",result="hit"} 1.0',
+            'yatube_page_cache_requests_total'
+            '{view="posts:index",result="miss"} 1.0',
+            # Второй раз лента пришла из кэша: запросов за постами нет,
+            # а шаблон вокруг неё отрисован заново.
+            'yatube_db_queries_per_request_sum{view="posts:index"} 1.0',
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"} 2.0',
+        ):
+            self.assertIn(line, text)
+        self.assertRegex(
+            text,
+            r'yatube_cache_requests_total\{cache="default",result="hit"\} '
+            r'[1-9]')
+
+    def test_buckets_cumulative(self):
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'), **self.AUTH)
+        text = response.content.decode()
+        buckets = [
+            float(line.rpartition(' ')[2]) for line in text.splitlines()
+            if line.startswith(
+                'yatube_db_queries_per_request_bucket{view="posts:index"')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 1)
+
+    def test_not_allowed(self):
+        """Без верного токена адреса нет, даже с локального адреса."""
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(reverse('metrics'), **headers)
+                self.assertEqual(response.status_code, 404)
+        with override_settings(METRICS_TOKEN=''):
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(response.status_code, 404)
@@ -0,0 +1,19 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from . import registry
+
+
+def metrics(request):
+    """Метрики для Prometheus. Отдаются только с заголовком
+    Authorization: Bearer METRICS_TOKEN; без токена в настройках
+    адреса нет. Адрес клиента не проверяется: за обратным прокси
+    все запросы приходят с его адреса."""
+    token = settings.METRICS_TOKEN
+    sent = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not hmac.compare_digest(sent, f'Bearer {token}'):
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4')
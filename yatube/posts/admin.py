@@ -1,28 +1,148 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
 
+from . import search
+from .forms import PostImageFormMixin
 from .models import Comment, Follow, Group, Post
 
 
-class PostAdmin(admin.ModelAdmin):
+def estimated_count(queryset):
+    """Оценка числа строк таблицы из статистики СУБД, без COUNT(*).
+    Где статистики нет, берём максимальный id - это один шаг по индексу."""
+    table = queryset.model._meta.db_table
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # -1 или 0 - таблицу ещё ни разу не анализировали.
+            if row and row[0] > 0:
+                return row[0]
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table])
+            row = cursor.fetchone()
+            if row and row[0]:
+                return row[0]
+    return queryset.model._default_manager.using(queryset.db).aggregate(
+        last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для выборки без фильтров по большой таблице число страниц
+    считается по оценке. Последние страницы могут оказаться пустыми,
+    зато changelist не ждёт COUNT(*) по миллионам строк."""
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class JoinedAutocompleteSelect(AutocompleteSelect):
+    """Автокомплит, которому выбранный объект можно передать готовым.
+    В строках changelist он уже подтянут list_select_related,
+    и отдельный запрос на подпись каждой строки не нужен."""
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or [str(selected.pk)] != [str(v) for v in value]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        label = self.choices.field.label_from_instance(selected)
+        options.append(self.create_option(
+            name, selected.pk, label, True, len(options)))
+        return [(None, options, 0)]
+
+
+class JoinedChangeListForm(forms.ModelForm):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            # Поле связи обёрнуто в RelatedFieldWidgetWrapper.
+            widget = getattr(field.widget, 'widget', field.widget)
+            if isinstance(widget, JoinedAutocompleteSelect):
+                widget.selected = getattr(self.instance, name)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist для таблиц на миллионы строк: связи подтягиваются
+    join'ом, внешние ключи выбираются автокомплитом, а не <select>
+    со всей таблицей, вместо точного числа строк - оценка.
+    Переход по датам (date_hierarchy) идёт по индексу поля,
+    см. шаблон admin/posts/change_list.html."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', JoinedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', JoinedChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+
+class PostAdminForm(PostImageFormMixin, forms.ModelForm):
+    class Meta:
+        model = Post
+        fields = '__all__'
+
+
+class PostAdmin(LargeTableAdmin):
 
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     list_editable = ('group',)
+    autocomplete_fields = ('author', 'group')
     empty_value_display = '-пусто-'
+    form = PostAdminForm
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%'.
+        if not search_term:
+            return queryset, False
+        return search.matching(queryset, search_term), False
 
 
 class GroupAdmin(admin.ModelAdmin):
 
     list_display = ('pk', 'title', 'slug', 'description')
+    search_fields = ('title',)
     prepopulated_fields = {'slug': ('title',)}
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
 
     list_display = ('pk', 'post', 'author', 'text', 'created')
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
     list_filter = ('created',)
+    date_hierarchy = 'created'
+    autocomplete_fields = ('post', 'author')
 
 
 class FollowAdmin(admin.ModelAdmin):
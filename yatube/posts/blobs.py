@@ -0,0 +1,73 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from sorl.thumbnail import delete
+
+from jobs.queue import enqueue
+
+from .models import ImageBlob, Post
+from .thumbnails import source_file
+
+
+def acquire(name):
+    """Добавляет ссылку на файл. Возвращает True, если файл новый
+    и для него ещё нужно строить миниатюры."""
+    if not name:
+        return False
+    if ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1):
+        return False
+    # Без get_or_create: SELECT перед INSERT для новой картинки лишний.
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, refs=1)
+    except IntegrityError:
+        # Ту же картинку только что загрузили в соседнем запросе.
+        ImageBlob.objects.filter(name=name).update(refs=F('refs') + 1)
+        return False
+    return True
+
+
+def release(name):
+    """Убирает ссылку на файл. Файл без ссылок удаляет фоновая задача."""
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1)
+    if ImageBlob.objects.filter(name=name, refs=0).exists():
+        enqueue(purge, name)
+
+
+def purge(name):
+    """Фоновая задача: удаляет файл, на который не осталось ссылок,
+    вместе с его миниатюрами. Строка файла заблокирована, пока файл
+    удаляется: acquire той же картинки ждёт конца транзакции и потом
+    создаёт строку заново, а не находит старую без файла. Если за
+    это время файл снова загрузили, ссылки появились и удалять нечего."""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(
+            name=name, refs=0).first()
+        if blob is None:
+            return
+        delete(source_file(name))
+        blob.delete()
+
+
+def reconcile():
+    """Пересчитывает ссылки на файлы по постам, например после
+    загрузки постов в обход сигналов. Возвращает число файлов."""
+    posts = Post.objects.exclude(image='').order_by()
+    ImageBlob.objects.bulk_create(
+        (
+            ImageBlob(name=name) for name in
+            posts.exclude(image__in=ImageBlob.objects.values('name'))
+            .values_list('image', flat=True).distinct().iterator()
+        ),
+        ignore_conflicts=True,
+    )
+    ImageBlob.objects.update(refs=Coalesce(Subquery(
+        posts.filter(image=OuterRef('name'))
+        .values('image')
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0))
+    return ImageBlob.objects.count()
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    ), 0)
+
+
+def _shift(field, delta):
+    """F(field) + delta, но не ниже нуля: счётчик мог разойтись
+    с реальностью (bulk_create, импорт без пересчёта), и уход
+    в минус нарушил бы ограничение PositiveIntegerField."""
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def bump_user(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя: bump_user(1, posts_count=1).
+    Строку счётчиков создаёт, если её ещё нет."""
+    changes = {field: _shift(field, delta) for field, delta in deltas.items()}
+    if UserStats.objects.filter(pk=user_id).update(**changes):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        # Уменьшать нечего: строки нет, пользователь скорее всего удалён.
+        return
+    _, created = UserStats.objects.get_or_create(
+        pk=user_id, defaults=deltas)
+    if not created:
+        UserStats.objects.filter(pk=user_id).update(**changes)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shift('comments_count', delta))
+
+
+def stats_for(user):
+    """Счётчики пользователя; для пользователя без строки - нули."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def reconcile():
+    """Пересчитывает все счётчики по исходным таблицам.
+    Возвращает число строк, которые разошлись с реальностью."""
+    UserStats.objects.bulk_create(
+        (
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(stats__isnull=True)
+            .values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+    # OuterRef в _count смотрит на pk, а у UserStats pk - это user_id.
+    real = {
+        'posts_count': _count(Post.objects, 'author'),
+        'followers_count': _count(Follow.objects, 'author'),
+        'following_count': _count(Follow.objects, 'user'),
+    }
+    drifted = (
+        UserStats.objects
+        .annotate(**{f'real_{name}': value for name, value in real.items()})
+        .exclude(**{name: F(f'real_{name}') for name in real})
+        .count()
+    )
+    UserStats.objects.update(**real)
+    comments = _count(Comment.objects, 'post')
+    drifted += (
+        Post.objects.annotate(real_comments_count=comments)
+        .exclude(comments_count=F('real_comments_count'))
+        .count()
+    )
+    Post.objects.update(comments_count=comments)
+    return drifted
@@ -0,0 +1,150 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from metrics import registry
+
+from . import thumbnails
+from .models import Group, Post
+from .utils import paginator
+
+User = get_user_model()
+
+VERSION_KEY = 'feed-version:{}'
+# Версия, которую получают все ленты: её сдвигают изменения,
+# затрагивающие каждую страницу (например, переименование группы).
+ALL = 'all'
+
+
+def _fresh_version():
+    # Версия из часов, а не с нуля: если ключ версии вытеснят из кэша,
+    # новая версия не совпадёт со старыми закэшированными страницами.
+    return int(time.time() * 1000)
+
+
+def versions(*scopes):
+    keys = [VERSION_KEY.format(scope) for scope in (ALL,) + scopes]
+    found = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Сдвигает версии лент: их старые страницы больше не читаются."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+
+
+def profile_scope(user_id):
+    username = (
+        User.objects.filter(pk=user_id)
+        .values_list('username', flat=True).first()
+    )
+    return username and f'profile:{username}'
+
+
+def group_scope(group_id):
+    slug = group_id and (
+        Group.objects.filter(pk=group_id)
+        .values_list('slug', flat=True).first()
+    )
+    return slug and f'group:{slug}'
+
+
+def post_scopes(author_id, *group_ids):
+    """Ленты, на которых показывается пост."""
+    scopes = ['index', profile_scope(author_id)]
+    scopes.extend(group_scope(group_id) for group_id in set(group_ids))
+    return [scope for scope in scopes if scope]
+
+
+def saved_post_scopes(post, *old_group_ids):
+    """post_scopes для только что сохранённого поста. Автор и группа,
+    уже загруженные вместе с постом (из формы или request.user),
+    не читаются из БД ещё раз."""
+    scopes = ['index']
+    if Post.author.is_cached(post):
+        scopes.append(f'profile:{post.author.username}')
+    else:
+        scopes.append(profile_scope(post.author_id))
+    group_ids = set(old_group_ids) - {post.group_id}
+    if post.group_id and Post.group.is_cached(post):
+        scopes.append(f'group:{post.group.slug}')
+    else:
+        group_ids.add(post.group_id)
+    scopes.extend(group_scope(group_id) for group_id in group_ids)
+    return [scope for scope in scopes if scope]
+
+
+def bump_image(name):
+    """Сдвигает версии лент, где есть посты с картинкой name."""
+    scopes = set()
+    posts = Post.objects.filter(image=name).values_list(
+        'author_id', 'group_id')
+    for author_id, group_id in posts:
+        scopes.update(post_scopes(author_id, group_id))
+    bump(*scopes)
+
+
+def cache_feed(scope):
+    """Кэширует ленту до сдвига версии её области.
+    scope - шаблон области, например 'group:{slug}', заполняется
+    аргументами URL; лента живёт, пока версия области не сдвинута,
+    но не дольше FEED_CACHE_TIMEOUT - на случай изменений, которые
+    версий не сдвигают.
+
+    Кэшируется не вся страница, а блок {% cached_feed %} шаблона:
+    он одинаков для всех, и копия в кэше одна на адрес, а не на
+    пользователя. Шапка с именем пользователя и кнопка подписки
+    рисуются на каждый запрос."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'GET':
+                version = '.'.join(
+                    str(number)
+                    for number in versions(scope.format(**kwargs)))
+                path = hashlib.md5(
+                    request.get_full_path().encode()).hexdigest()
+                request.feed_cache_key = f'feed:{path}:{version}'
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render(request, nodelist, context):
+    """Блок ленты из кэша или отрисованный заново."""
+    key = getattr(request, 'feed_cache_key', None)
+    if key is None:
+        return nodelist.render(context)
+    html = cache.get(key)
+    match = request.resolver_match
+    registry.PAGE_CACHE_REQUESTS.inc(
+        view=match.view_name if match else '',
+        result='miss' if html is None else 'hit')
+    if html is None:
+        html = nodelist.render(context)
+        cache.set(key, html, settings.FEED_CACHE_TIMEOUT)
+    return html
+
+
+def lazy_page(request, object_list):
+    """Страница ленты, которая выбирается из БД при первом обращении:
+    если блок ленты нашёлся в кэше, запросов за постами нет."""
+    def page():
+        page_obj = paginator(request, object_list)
+        thumbnails.prefetch(page_obj)
+        return page_obj
+    return SimpleLazyObject(page)
@@ -1,10 +1,38 @@
 # from xml.etree.ElementTree import Comment
 from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import check_size, process_image
 
 
-class PostForm(forms.ModelForm):
+class PostImageFormMixin:
+    """Проверка и очистка загруженной картинки поста. Нужна каждой
+    форме с полем image: LimitedUploadHandler только помечает
+    слишком большой файл обрезанным, отклоняет его форма."""
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохранённую картинку при редактировании не трогаем.
+        if isinstance(image, UploadedFile):
+            image = process_image(image)
+        return image
+
+    def clean(self):
+        upload = self.files.get('image')
+        if upload is not None:
+            try:
+                check_size(upload)
+            except ValidationError as error:
+                # Обрезанный файл уже не читается как картинка:
+                # вместо ошибки формата сообщаем о размере.
+                self.errors.pop('image', None)
+                self.add_error('image', error)
+        return super().clean()
+
+
+class PostForm(PostImageFormMixin, forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
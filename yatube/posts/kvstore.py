@@ -0,0 +1,96 @@
+import threading
+from collections import Counter
+
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+_local = threading.local()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def count(**deltas):
+    with _stats_lock:
+        _stats.update(deltas)
+
+
+def stats():
+    """Счётчики обращений к хранилищу миниатюр:
+    prefetch_hits - найдено в предзагрузке страницы,
+    cache_hits - в кэше, db_reads - пришлось читать из БД."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _prefetched():
+    if not hasattr(_local, 'values'):
+        _local.values = {}
+    return _local.values
+
+
+def clear_prefetched():
+    """Сбрасывает предзагрузку: вызывается в конце каждого запроса."""
+    _local.values = {}
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей sorl-thumbnail: кэш перед БД.
+    Запись идёт сразу в БД и в кэш, чтение - из кэша, а промах
+    заполняет кэш из БД. Для страницы ленты все ключи миниатюр
+    можно загрузить заранее одним get_many (prefetch), тогда
+    рендер карточек не обращается ни к кэшу, ни к БД."""
+
+    def prefetch(self, keys):
+        """Загружает значения ключей (без префиксов) пачкой."""
+        keys = [add_prefix(key) for key in keys]
+        local = _prefetched()
+        keys = [key for key in keys if key not in local]
+        if not keys:
+            return
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            loaded = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(loaded, settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(loaded)
+        count(cache_hits=len(keys) - len(missing), db_reads=len(missing))
+        local.update(found)
+
+    def _get_raw(self, key):
+        local = _prefetched()
+        if key in local:
+            count(prefetch_hits=1)
+            value = local[key]
+        else:
+            value = self.cache.get(key)
+            if value is None:
+                count(db_reads=1)
+                try:
+                    value = KVStoreModel.objects.get(key=key).value
+                except KVStoreModel.DoesNotExist:
+                    # Отсутствие ключа тоже кэшируем.
+                    value = EMPTY_VALUE
+                self.cache.set(key, value, settings.THUMBNAIL_CACHE_TIMEOUT)
+            else:
+                count(cache_hits=1)
+        if value == EMPTY_VALUE:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        _prefetched().pop(key, None)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        local = _prefetched()
+        for key in keys:
+            local.pop(key, None)
@@ -0,0 +1,283 @@
+"""Нагрузка с замкнутым циклом на WSGI-приложение yatube.wsgi.
+
+Каждый виртуальный пользователь отправляет запрос, ждёт ответа,
+выдерживает паузу на раздумье и выбирает следующее действие по весам
+смеси. Запросы идут прямо в application(environ, start_response),
+без сети, так что замер показывает поведение самого приложения:
+блокировки SQLite, кэш внутри процесса, работу с сессиями."""
+import io
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connections
+from django.urls import reverse
+
+from .models import Group, Post, UserStats
+
+User = get_user_model()
+
+# Действие смеси -> имя URL в отчёте.
+ACTIONS = {
+    'index': 'posts:index',
+    'group': 'posts:group_posts',
+    'profile': 'posts:profile',
+    'detail': 'posts:post_detail',
+    'follow_feed': 'posts:follow_index',
+    'post': 'posts:post_create',
+    'comment': 'posts:add_comment',
+    'follow': 'posts:profile_follow',
+}
+DEFAULT_MIX = (
+    'index=35,group=10,profile=10,detail=15,follow_feed=15,'
+    'post=3,comment=7,follow=5'
+)
+# Сколько объектов каждого вида держать для случайного выбора.
+SAMPLE = 1000
+
+
+def parse_mix(text):
+    """'index=40,post=5' -> {'index': 40.0, 'post': 5.0}."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(
+                f'Неизвестное действие {name!r}, есть: {", ".join(ACTIONS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def targets():
+    """Что запрашивать: свежие посты, группы, активные авторы
+    и читатели, у которых есть подписки."""
+    readers = list(
+        UserStats.objects.filter(following_count__gt=0)
+        .order_by('-following_count')
+        .values_list('user_id', flat=True)[:SAMPLE]
+    ) or list(User.objects.values_list('pk', flat=True)[:SAMPLE])
+    return {
+        'posts': list(
+            Post.objects.order_by('-pk')
+            .values_list('pk', flat=True)[:SAMPLE]),
+        'groups': list(Group.objects.values_list('slug', flat=True)[:SAMPLE]),
+        'authors': list(
+            UserStats.objects.order_by('-posts_count')
+            .values_list('user__username', flat=True)[:SAMPLE]),
+        'readers': readers,
+    }
+
+
+def login(user_id):
+    """Сессия вошедшего пользователя, как её создаёт вход на сайт,
+    но без дорогой проверки пароля."""
+    user = User.objects.get(pk=user_id)
+    session = SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class Browser:
+    """Клиент с собственными cookie, который ходит в WSGI-приложение."""
+
+    def __init__(self, application):
+        self.application = application
+        self.cookies = {}
+
+    def request(self, method, path, data=None):
+        body = urlencode(data or {}).encode()
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_HOST': 'localhost',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        }
+        if self.cookies:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items())
+        if 'csrftoken' in self.cookies:
+            environ['HTTP_X_CSRFTOKEN'] = self.cookies['csrftoken']
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        chunks = self.application(environ, start_response)
+        try:
+            for _ in chunks:
+                pass
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        for name, value in response['headers']:
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+        return response['status']
+
+
+class VirtualUser:
+    """Посетитель: ленты читает анонимно, а пишет и читает подписки
+    под своим пользователем."""
+
+    def __init__(self, application, data, mix, rng, think):
+        self.data = data
+        self.rng = rng
+        self.think = think
+        self.actions = list(mix)
+        self.weights = list(mix.values())
+        self.anonymous = Browser(application)
+        self.member = Browser(application)
+        self.member.cookies['sessionid'] = login(rng.choice(data['readers']))
+        # Страница с формой выдаёт cookie csrftoken для POST-запросов.
+        self.member.request('GET', reverse('posts:post_create'))
+        self.following = set()
+
+    def step(self):
+        """Одно действие: (имя URL, код ответа, секунды)."""
+        action = self.rng.choices(self.actions, self.weights)[0]
+        method, path, data, browser = getattr(self, action)()
+        started = time.perf_counter()
+        try:
+            status = browser.request(method, path, data)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+        return ACTIONS[action], status, elapsed
+
+    def index(self):
+        return 'GET', reverse('posts:index'), None, self.anonymous
+
+    def group(self):
+        slug = self.rng.choice(self.data['groups'])
+        return ('GET', reverse('posts:group_posts', args=(slug,)), None,
+                self.anonymous)
+
+    def profile(self):
+        username = self.rng.choice(self.data['authors'])
+        return ('GET', reverse('posts:profile', args=(username,)), None,
+                self.anonymous)
+
+    def detail(self):
+        post_id = self.rng.choice(self.data['posts'])
+        return ('GET', reverse('posts:post_detail', args=(post_id,)), None,
+                self.anonymous)
+
+    def follow_feed(self):
+        return 'GET', reverse('posts:follow_index'), None, self.member
+
+    def post(self):
+        text = f'Пост под нагрузкой {self.rng.getrandbits(32):x}'
+        return ('POST', reverse('posts:post_create'), {'text': text},
+                self.member)
+
+    def comment(self):
+        post_id = self.rng.choice(self.data['posts'])
+        return ('POST', reverse('posts:add_comment', args=(post_id,)),
+                {'text': 'Комментарий под нагрузкой'}, self.member)
+
+    def follow(self):
+        # Подписка и отписка по очереди, чтобы число подписок не росло.
+        username = self.rng.choice(self.data['authors'])
+        view = 'posts:profile_follow'
+        if username in self.following:
+            view = 'posts:profile_unfollow'
+            self.following.discard(username)
+        else:
+            self.following.add(username)
+        return 'GET', reverse(view, args=(username,)), None, self.member
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу: percentile(values, 0.95) - p95."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class Results:
+    """Времена ответов и ошибки по именам URL."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, name, status, elapsed):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if status is None or status >= 400:
+                self.errors[name] += 1
+
+    def merge(self, other):
+        for name, values in other['latencies'].items():
+            self.latencies[name].extend(values)
+        for name, count in other['errors'].items():
+            self.errors[name] += count
+
+    def as_dict(self):
+        return {
+            'latencies': dict(self.latencies),
+            'errors': dict(self.errors),
+        }
+
+
+def run_process(config):
+    """Задача процесса пула: config['concurrency'] виртуальных
+    пользователей в потоках до окончания времени нагрузки."""
+    from yatube.wsgi import application
+    data = targets()
+    results = Results()
+    warmup_until = config['started'] + config['warmup']
+    deadline = warmup_until + config['duration']
+
+    def loop(number):
+        rng = random.Random(f'{config["seed"]}:{config["process"]}:{number}')
+        user = VirtualUser(
+            application, data, config['mix'], rng, config['think'])
+        while time.time() < deadline:
+            name, status, elapsed = user.step()
+            if time.time() > warmup_until:
+                results.add(name, status, elapsed)
+
+    def thread(number):
+        try:
+            loop(number)
+        finally:
+            # У каждого потока свои соединения с БД.
+            connections.close_all()
+
+    if config['concurrency'] == 1:
+        loop(0)
+    else:
+        threads = [
+            threading.Thread(target=thread, args=(number,))
+            for number in range(config['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results.as_dict()
@@ -0,0 +1,125 @@
+import random
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from core.queries import QueryCounter
+from posts import counters
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import TimelinePaginator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок в режимах pull, push и hybrid '
+        'на сгенерированном графе подписок. Все данные откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Сколько авторов выбирает каждый пользователь.')
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.2,
+            help='Показатель степени распределения популярности авторов.')
+        parser.add_argument(
+            '--threshold', type=int, default=100,
+            help='Порог подписчиков для режима hybrid.')
+        parser.add_argument('--readers', type=int, default=50)
+        parser.add_argument('--pages', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        strategies = (
+            ('pull', 0),
+            ('push', sys.maxsize),
+            ('hybrid', options['threshold']),
+        )
+        self.stdout.write(
+            f'{"режим":<8}{"запись, с":>12}{"строк ленты":>14}'
+            f'{"мс/стр.":>10}{"запросов/стр.":>16}'
+        )
+        for name, threshold in strategies:
+            with transaction.atomic():
+                with override_settings(
+                        TIMELINE_CELEBRITY_FOLLOWERS=threshold):
+                    row = self.run(options)
+                transaction.set_rollback(True)
+            write_time, entries, read_ms, queries = row
+            self.stdout.write(
+                f'{name:<8}{write_time:>12.2f}{entries:>14}'
+                f'{read_ms:>10.2f}{queries:>16.1f}'
+            )
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        users = User.objects.bulk_create(
+            User(username=f'timeline_bench_{number}')
+            for number in range(options['users'])
+        )
+        if connection.features.can_return_ids_from_bulk_insert:
+            user_ids = [user.pk for user in users]
+        else:
+            user_ids = list(
+                User.objects.filter(username__startswith='timeline_bench_')
+                .order_by('pk').values_list('pk', flat=True)
+            )
+        author_ids = user_ids[:options['authors']]
+        weights = [
+            1 / (rank + 1) ** options['zipf']
+            for rank in range(len(author_ids))
+        ]
+        follows = []
+        for user_id in user_ids:
+            chosen = set(rng.choices(
+                author_ids, weights, k=options['follows']))
+            chosen.discard(user_id)
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in chosen
+            )
+        Follow.objects.bulk_create(follows)
+        # bulk_create обходит сигналы: счётчики подписчиков
+        # нужны для выбора знаменитостей, пересчитываем их.
+        counters.reconcile()
+
+        started = time.perf_counter()
+        for number in range(options['posts']):
+            Post.objects.create(
+                text=f'Пост для замера {number}',
+                author_id=rng.choices(author_ids, weights)[0],
+            )
+        write_time = time.perf_counter() - started
+
+        readers = User.objects.filter(
+            pk__in=rng.sample(user_ids, options['readers']))
+        counter = QueryCounter()
+        pages = 0
+        started = time.perf_counter()
+        with counter.watch():
+            for reader in readers:
+                cursor = None
+                for _ in range(options['pages']):
+                    page = TimelinePaginator(
+                        reader, settings.COUNT_POSTS).get_page(cursor)
+                    pages += 1
+                    cursor = page.next_cursor
+                    if cursor is None:
+                        break
+        read_ms = (time.perf_counter() - started) * 1000 / max(pages, 1)
+        return (
+            write_time,
+            TimelineEntry.objects.count(),
+            read_ms,
+            counter.count / max(pages, 1),
+        )
@@ -0,0 +1,110 @@
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+
+from posts.uploads import process_image
+
+MODES = ('baseline', 'naive', 'stream')
+
+
+def peak_rss():
+    """Пиковый RSS процесса в КиБ. VmHWM в Linux считается заново
+    после exec, а ru_maxrss может достаться от родителя."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def naive(path):
+    # Как было: картинка декодируется целиком и пересохраняется с EXIF.
+    with Image.open(path) as image:
+        image.load()
+        image.save(
+            BytesIO(), image.format, exif=image.info.get('exif', b''))
+
+
+def stream(path):
+    with open(path, 'rb') as source:
+        upload = UploadedFile(
+            source, os.path.basename(path), 'image/jpeg',
+            os.path.getsize(path))
+        process_image(upload).close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пиковую память (RSS) при обработке больших картинок: '
+        'полное декодирование против потоковой обработки загрузок. '
+        'Каждый замер идёт в отдельном процессе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', default=['2000x1500', '6000x4000',
+                                           '8000x6000'],
+            help='Размеры тестовых JPEG, ШИРИНАxВЫСОТА.')
+        parser.add_argument(
+            '--child', nargs=2, metavar=('MODE', 'PATH'),
+            help='Служебный: один замер в этом процессе.')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            self.measure(*options['child'])
+            return
+        self.stdout.write(
+            f'{"размер":<12}{"файл, МБ":>10}'
+            + ''.join(f'{mode + ", МБ":>16}' for mode in MODES)
+            + f'{"stream, с":>12}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for size in options['sizes']:
+                width, height = (int(side) for side in size.split('x'))
+                path = os.path.join(directory, f'{size}.jpg')
+                self.make_image(path, width, height)
+                results = {mode: self.spawn(mode, path) for mode in MODES}
+                self.stdout.write(
+                    f'{size:<12}{os.path.getsize(path) / 2 ** 20:>10.1f}'
+                    + ''.join(
+                        f'{results[mode][0] / 1024:>16.1f}' for mode in MODES)
+                    + f'{results["stream"][1]:>12.2f}'
+                )
+
+    def make_image(self, path, width, height):
+        image = Image.new('RGB', (width, height), 'white')
+        draw = ImageDraw.Draw(image)
+        for x in range(0, width, 50):
+            draw.line((x, 0, width - x, height), fill=(x % 256, 80, 160))
+        exif = Image.Exif()
+        exif[0x010F] = 'benchmark'
+        image.save(path, 'JPEG', quality=90, exif=exif.tobytes())
+
+    def spawn(self, mode, path):
+        output = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+             'benchmark_uploads', '--child', mode, path],
+            check=True, capture_output=True, text=True,
+        ).stdout.split()
+        return int(output[0]), float(output[1])
+
+    def measure(self, mode, path):
+        started = time.perf_counter()
+        if mode == 'naive':
+            naive(path)
+        elif mode == 'stream':
+            stream(path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{peak_rss()} {elapsed}')
@@ -0,0 +1,258 @@
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.queries import QueryCounter
+from posts.loadtest import percentile
+from posts.models import Group, Post, UserStats
+
+VIEWS = (
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'posts:add_comment',
+)
+# Метрики, рост которых считается регрессией, и допуск для них:
+# время и память шумят, число запросов должно совпадать точно.
+TOLERANT = ('median_ms', 'peak_kib')
+EXACT = ('queries',)
+
+
+@contextmanager
+def use_database(path):
+    """Временно направляет соединение default в другой файл SQLite."""
+    connection = connections['default']
+    original = connection.settings_dict['NAME']
+    connection.close()
+    connection.settings_dict['NAME'] = path
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict['NAME'] = original
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время, число SQL-запросов и выделенную память '
+        'основных view через тестовый клиент на наборах данных '
+        'разного размера, пишет результат в JSON и сравнивает его '
+        'с сохранённым базовым замером.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,100000,1000000',
+            help='Размеры наборов данных в постах, через запятую.')
+        parser.add_argument(
+            '--data-dir',
+            default=os.path.join(settings.BASE_DIR, 'benchmarks'),
+            help='Где лежат (и создаются) файлы SQLite с наборами данных.')
+        parser.add_argument(
+            '--current-db', action='store_true',
+            help='Мерить на текущей базе, не создавая наборов данных.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кэш перед каждым запросом: мерить отдачу '
+                 'из кэша лент, а не построение страницы.')
+        parser.add_argument('--output', help='Куда записать результат.')
+        parser.add_argument(
+            '--baseline', help='Базовый замер для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост времени и памяти, доля от базы.')
+
+    def handle(self, *args, **options):
+        results = {}
+        if options['current_db']:
+            results['current'] = self.run_views(options)
+        else:
+            if connections['default'].vendor != 'sqlite':
+                raise CommandError(
+                    'Наборы данных создаются в файлах SQLite, '
+                    'для другой СУБД используйте --current-db.')
+            os.makedirs(options['data_dir'], exist_ok=True)
+            for size in map(int, options['sizes'].split(',')):
+                path = os.path.join(
+                    options['data_dir'],
+                    f'posts-{size}-seed-{options["seed"]}.sqlite3')
+                # Набор создаётся один раз и переиспользуется: если
+                # создание прервалось, файл нужно удалить вручную.
+                exists = os.path.exists(path)
+                with use_database(path):
+                    if not exists:
+                        self.seed(size, options)
+                    results[str(size)] = self.run_views(options)
+        report = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connections['default'].vendor,
+                'repeat': options['repeat'],
+                'warm_cache': options['warm_cache'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline:
+                self.compare(
+                    json.load(baseline)['results'], results,
+                    options['threshold'])
+
+    def seed(self, size, options):
+        self.stdout.write(f'Создаётся набор данных на {size} постов...')
+        started = time.perf_counter()
+        call_command('migrate', verbosity=0)
+        call_command(
+            'seed_yatube', stdout=StringIO(),
+            posts=size,
+            users=max(size // 20, 50),
+            groups=max(size // 5000, 5),
+            comments=size,
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f'Готово за {time.perf_counter() - started:.0f} с')
+
+    def targets(self):
+        """Самые тяжёлые страницы набора: крупнейшая группа,
+        самый плодовитый автор, самый обсуждаемый пост и читатель
+        с наибольшим числом подписок."""
+        group = (
+            Group.objects.annotate(size=Count('posts'))
+            .order_by('-size').first()
+        )
+        author = UserStats.objects.select_related('user').order_by(
+            '-posts_count').first().user
+        reader = UserStats.objects.select_related('user').order_by(
+            '-following_count').first().user
+        post = Post.objects.order_by('-comments_count', 'pk').first()
+        if group is None or post is None:
+            raise CommandError('В базе нет постов в группах.')
+        return {
+            'posts:index': ('get', reverse('posts:index'), None),
+            'posts:group_posts': (
+                'get', reverse('posts:group_posts', args=(group.slug,)),
+                None),
+            'posts:profile': (
+                'get', reverse('posts:profile', args=(author.username,)),
+                None),
+            'posts:post_detail': (
+                'get', reverse('posts:post_detail', args=(post.pk,)),
+                None),
+            'posts:follow_index': (
+                'get', reverse('posts:follow_index'), reader),
+            'posts:add_comment': (
+                'post', reverse('posts:add_comment', args=(post.pk,)),
+                reader),
+        }, {'text': 'Комментарий для замера'}
+
+    def run_views(self, options):
+        targets, data = self.targets()
+        anonymous = Client()
+        results = {}
+        for name in VIEWS:
+            method, url, user = targets[name]
+            client = anonymous
+            if user is not None:
+                client = Client()
+                client.force_login(user)
+            request = (
+                (lambda: client.post(url, data)) if method == 'post'
+                else (lambda: client.get(url)))
+            results[name] = self.measure(name, request, options)
+        return results
+
+    def call(self, request, options):
+        if not options['warm_cache']:
+            cache.clear()
+        # Записи откатываются: набор данных от замера к замеру не меняется.
+        with transaction.atomic():
+            response = request()
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(f'Ответ {response.status_code}')
+
+    def measure(self, name, request, options):
+        for _ in range(options['warmup']):
+            self.call(request, options)
+        durations = []
+        counter = QueryCounter()
+        for _ in range(options['repeat']):
+            with counter.watch():
+                started = time.perf_counter()
+                self.call(request, options)
+                durations.append(time.perf_counter() - started)
+        # Память - отдельным проходом: tracemalloc замедляет код
+        # и исказил бы время.
+        tracemalloc.start()
+        try:
+            self.call(request, options)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result = {
+            'median_ms': statistics.median(durations) * 1000,
+            'p95_ms': percentile(durations, 0.95) * 1000,
+            'min_ms': min(durations) * 1000,
+            'queries': counter.count / options['repeat'],
+            'peak_kib': peak / 1024,
+        }
+        self.stdout.write(
+            f'{name:<20}{result["median_ms"]:>10.2f} мс'
+            f'{result["p95_ms"]:>10.2f} мс p95'
+            f'{result["queries"]:>8.1f} запр.'
+            f'{result["peak_kib"]:>10.0f} КиБ')
+        return result
+
+    def compare(self, baseline, results, threshold):
+        regressions = []
+        for size, views in results.items():
+            for name, result in views.items():
+                base = baseline.get(size, {}).get(name)
+                if base is None:
+                    continue
+                for metric in TOLERANT + EXACT:
+                    allowed = base[metric] * (
+                        1 + threshold if metric in TOLERANT else 1)
+                    change = (
+                        result[metric] / base[metric] - 1 if base[metric]
+                        else 0)
+                    line = (
+                        f'{size:>8} {name:<20}{metric:<10}'
+                        f'{base[metric]:>10.2f} -> {result[metric]:>10.2f}'
+                        f'{change:>+9.0%}')
+                    if result[metric] > allowed:
+                        regressions.append(line)
+                        line = self.style.ERROR(line)
+                    self.stdout.write(line)
+        if regressions:
+            raise CommandError(
+                'Регрессия относительно базового замера:\n'
+                + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,14 @@
+from posts.models import Comment
+from posts.transfer import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Выгружает комментарии в JSONL: автор - по username.'
+    model = Comment
+    fields = {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }
@@ -0,0 +1,12 @@
+from posts.models import Follow
+from posts.transfer import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Выгружает подписки в JSONL: пользователи - по username.'
+    model = Follow
+    fields = {
+        'id': 'pk',
+        'user': 'user__username',
+        'author': 'author__username',
+    }
@@ -0,0 +1,18 @@
+from posts.models import Post
+from posts.transfer import ExportCommand
+
+
+class Command(ExportCommand):
+    help = 'Выгружает посты в JSONL: автор - по username, группа - по slug.'
+    model = Post
+    fields = {
+        'id': 'pk',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'image_width': 'image_width',
+        'image_height': 'image_height',
+        'image_placeholder': 'image_placeholder',
+    }
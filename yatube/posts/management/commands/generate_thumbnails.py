@@ -0,0 +1,69 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from posts import feed_cache, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры и их варианты по ширинам и форматам, '
+        'размеры и заглушки для картинок уже опубликованных постов, '
+        'по умолчанию - на всех ядрах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько процессов строят миниатюры.')
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .order_by('image')
+            .values_list('image', flat=True)
+            .distinct()
+            .iterator()
+        )
+        workers = options['workers']
+        done = failed = 0
+        started = time.perf_counter()
+        with thumbnails.make_pool(workers) as pool:
+            # Держим в очереди пула ограниченное число задач,
+            # чтобы не создавать future на каждый пост сразу.
+            pending = {
+                pool.submit(thumbnails.prepare, name)
+                for name in islice(names, workers * 4)
+            }
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future.exception() is not None:
+                        failed += 1
+                        self.stderr.write(str(future.exception()))
+                        continue
+                    name, described = future.result()
+                    # Файлы уже на месте: здесь sorl только
+                    # записывает миниатюры в своё хранилище ключей.
+                    thumbnails.render(name)
+                    if described is not None:
+                        width, height, placeholder = described
+                        Post.objects.filter(image=name).update(
+                            image_width=width,
+                            image_height=height,
+                            image_placeholder=placeholder,
+                        )
+                    done += 1
+                pending |= {
+                    pool.submit(thumbnails.prepare, name)
+                    for name in islice(names, len(finished))
+                }
+        # Карточки в кэше лент ссылаются на исходные картинки.
+        feed_cache.bump(feed_cache.ALL)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, ошибок: {failed}, {elapsed:.1f} с'))
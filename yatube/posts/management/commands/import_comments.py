@@ -0,0 +1,29 @@
+from posts.models import Comment, Post
+from posts.transfer import ImportCommand, User, lookup, parse_date, targets
+
+
+class Command(ImportCommand):
+    help = (
+        'Загружает комментарии из JSONL от export_comments. '
+        'Посты ищутся среди загруженных import_posts, комментарии '
+        'к другим постам или от авторов, которых нет в базе, '
+        'пропускаются.'
+    )
+    model = Comment
+    date_fields = ('created',)
+
+    def build(self, rows):
+        authors = lookup(User, 'username', (row['author'] for row in rows))
+        # id поста в выгрузке может принадлежать другому посту в базе.
+        posts = targets(Post, (row['post'] for row in rows))
+        return [
+            Comment(
+                pk=row['id'],
+                post_id=posts[row['post']],
+                author_id=authors[row['author']],
+                text=row['text'],
+                created=parse_date(row['created']),
+            )
+            for row in rows
+            if row['author'] in authors and row['post'] in posts
+        ]
@@ -0,0 +1,40 @@
+from posts import timeline
+from posts.models import Follow
+from posts.transfer import ImportCommand, User, lookup
+
+
+class Command(ImportCommand):
+    help = (
+        'Загружает подписки из JSONL от export_follows. '
+        'Подписки пользователей, которых нет в базе, пропускаются.'
+    )
+    model = Follow
+
+    def build(self, rows):
+        users = lookup(
+            User, 'username',
+            (name for row in rows for name in (row['user'], row['author'])))
+        return [
+            Follow(
+                pk=row['id'],
+                user_id=users[row['user']],
+                author_id=users[row['author']],
+            )
+            for row in rows
+            if row['user'] in users and row['author'] in users
+        ]
+
+    def duplicates(self, objects):
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={follow.user_id for follow in objects},
+                author_id__in={follow.author_id for follow in objects})
+            .values_list('user_id', 'author_id'))
+        return [
+            follow for follow in objects
+            if (follow.user_id, follow.author_id) in existing
+        ]
+
+    def rebuild(self):
+        super().rebuild()
+        timeline.rebuild()
@@ -0,0 +1,42 @@
+from posts import blobs, search, tags, timeline
+from posts.models import Group, Post
+from posts.transfer import ImportCommand, User, lookup, parse_date
+
+
+class Command(ImportCommand):
+    help = (
+        'Загружает посты из JSONL от export_posts. Авторы и группы '
+        'должны уже быть в базе, посты без них пропускаются. '
+        'Файлы картинок переносятся отдельно, миниатюры для них '
+        'строит generate_thumbnails.'
+    )
+    model = Post
+    date_fields = ('pub_date',)
+
+    def build(self, rows):
+        authors = lookup(User, 'username', (row['author'] for row in rows))
+        groups = lookup(
+            Group, 'slug', (row['group'] for row in rows if row['group']))
+        return [
+            Post(
+                pk=row['id'],
+                text=row['text'],
+                pub_date=parse_date(row['pub_date']),
+                author_id=authors[row['author']],
+                group_id=groups.get(row['group']),
+                image=row['image'],
+                image_width=row['image_width'],
+                image_height=row['image_height'],
+                image_placeholder=row['image_placeholder'],
+            )
+            for row in rows
+            if row['author'] in authors
+            and (not row['group'] or row['group'] in groups)
+        ]
+
+    def rebuild(self):
+        super().rebuild()
+        blobs.reconcile()
+        search.rebuild()
+        tags.rebuild()
+        timeline.rebuild()
@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs import process
+from posts import loadtest
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает WSGI-приложение yatube.wsgi смесью чтения лент, '
+        'ленты подписок, постов, комментариев и подписок с замкнутым '
+        'циклом: каждый виртуальный пользователь ждёт ответа перед '
+        'следующим запросом. Печатает пропускную способность, '
+        'p50/p95/p99 и долю ошибок по именам URL. Данные пишутся '
+        'в текущую базу: запускайте на наборе от seed_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Сколько процессов, 0 - всё в этом процессе.')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Виртуальных пользователей (потоков) на процесс.')
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Сколько секунд мерить.')
+        parser.add_argument(
+            '--warmup', type=float, default=5,
+            help='Сколько секунд нагружать до начала замера.')
+        parser.add_argument(
+            '--think', type=float, default=0,
+            help='Средняя пауза пользователя между запросами, секунд.')
+        parser.add_argument(
+            '--mix', default=loadtest.DEFAULT_MIX,
+            help=f'Веса действий: {", ".join(loadtest.ACTIONS)}.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Куда записать отчёт в JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        if not Post.objects.filter(group__isnull=False).exists():
+            raise CommandError(
+                'Нужны посты в группах, например от seed_yatube.')
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING(
+                'DEBUG включён: Django сохраняет каждый SQL-запрос, '
+                'цифры будут хуже, чем в бою.'))
+        config = {
+            'mix': mix,
+            'seed': options['seed'],
+            'think': options['think'],
+            'warmup': options['warmup'],
+            'duration': options['duration'],
+            'concurrency': options['concurrency'],
+            'started': time.time(),
+        }
+        results = loadtest.Results()
+        if options['processes'] == 0:
+            results.merge(loadtest.run_process({**config, 'process': 0}))
+        else:
+            # spawn: дочерние процессы не наследуют соединения с БД.
+            with ProcessPoolExecutor(
+                max_workers=options['processes'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.setup,
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        loadtest.run_process, {**config, 'process': number})
+                    for number in range(options['processes'])
+                ]
+                for future in futures:
+                    results.merge(future.result())
+        report = self.report(results, options['duration'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+    def report(self, results, duration):
+        self.stdout.write(
+            f'{"URL":<24}{"запросов":>10}{"в сек.":>9}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}{"ошибок":>9}')
+        report = {}
+        for name in sorted(results.latencies):
+            latencies = results.latencies[name]
+            row = {
+                'requests': len(latencies),
+                'throughput': len(latencies) / duration,
+                'p50_ms': loadtest.percentile(latencies, 0.5) * 1000,
+                'p95_ms': loadtest.percentile(latencies, 0.95) * 1000,
+                'p99_ms': loadtest.percentile(latencies, 0.99) * 1000,
+                'error_rate': results.errors[name] / len(latencies),
+            }
+            report[name] = row
+            self.stdout.write(
+                f'{name:<24}{row["requests"]:>10}{row["throughput"]:>9.1f}'
+                f'{row["p50_ms"]:>10.1f}{row["p95_ms"]:>10.1f}'
+                f'{row["p99_ms"]:>10.1f}{row["error_rate"]:>9.1%}')
+        total = sum(row['requests'] for row in report.values())
+        errors = sum(results.errors.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего {total} запросов, {total / duration:.1f} в секунду, '
+            f'ошибок {errors / max(total, 1):.1%}'))
+        return report
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает индекс #тегов и @упоминаний, например после '
+        'массовой загрузки в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        count = tags.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {count}'))
@@ -0,0 +1,198 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from jobs import process
+from posts import (
+    blobs, counters, feed_cache, search, seed, tags, timeline)
+from posts.models import Group, Post
+
+User = seed.User
+
+# Распределения популярности авторов для подписок.
+FOLLOW_EXPONENTS = {'zipf': 1.1, 'uniform': 0}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, '
+        'постами, подписками и комментариями с перекосом популярности '
+        'по Ципфу. При одном --seed данные одинаковы при любом числе '
+        'процессов и размере пачек. Вставка идёт пачками bulk_create, '
+        'потом пересчитываются счётчики, индексы и ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Сколько авторов в среднем читает пользователь.')
+        parser.add_argument(
+            '--follows-dist', choices=sorted(FOLLOW_EXPONENTS),
+            default='zipf',
+            help='Как подписчики распределены между авторами.')
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='Сколько постов получат сгенерированную картинку.')
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель Ципфа для авторов, групп, тегов и постов.')
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до сегодняшнего дня раскидать посты.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix', default='seed_',
+            help='Начало имён пользователей и slug групп.')
+        parser.add_argument(
+            '--password',
+            help='Общий пароль пользователей, например для нагрузочных '
+                 'тестов. Без него войти под ними нельзя.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк вставлять одной транзакцией, '
+                 'округляется вверх до целой тысячи.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Сколько процессов вставляют пачки. Больше одного '
+                 'имеет смысл для СУБД с параллельной записью.')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, индексы и ленты.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and (options['posts'] or options['follows']):
+            raise CommandError('Нужно хотя бы два пользователя.')
+        if options['images'] > options['posts']:
+            raise CommandError('Картинок не может быть больше постов.')
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]!r} уже '
+                f'есть, выберите другой --prefix.')
+        plan = self.plan(options)
+        started = time.perf_counter()
+        pool = None
+        if options['workers'] > 1:
+            # spawn: дочерние процессы не наследуют соединения с БД.
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.setup,
+            )
+        try:
+            self.run(pool, plan, 'users', options['users'])
+            self.run(pool, plan, 'groups', options['groups'])
+            plan['group_ids'] = self.group_ids(plan, options['groups'])
+            self.run(pool, plan, 'posts', options['posts'])
+            self.run(pool, plan, 'follows', options['users'])
+            self.run(pool, plan, 'comments', options['comments'])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.reset_sequences()
+        if not options['no_rebuild']:
+            self.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'))
+        if options['images']:
+            self.stdout.write(
+                'Миниатюры и заглушки картинок строит generate_thumbnails.')
+
+    def plan(self, options):
+        """Всё, что нужно процессам пула: передаётся в каждую задачу."""
+        end = timezone.now().replace(hour=0, minute=0, second=0,
+                                     microsecond=0)
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        words = set()
+        # Слов в словаре Faker может не хватить на все теги.
+        while len(words) < options['tags']:
+            word = fake.word().lower()
+            words.add(word if word not in words else f'{word}{len(words)}')
+        return {
+            'seed': options['seed'],
+            'prefix': options['prefix'],
+            'users': options['users'],
+            'posts': options['posts'],
+            'follows': options['follows'],
+            'follows_zipf': FOLLOW_EXPONENTS[options['follows_dist']],
+            'comments': options['comments'],
+            'images': options['images'],
+            'zipf': options['zipf'],
+            'tags': sorted(words),
+            'start': end - timezone.timedelta(days=options['days']),
+            'span': options['days'] * 24 * 3600,
+            'password': make_password(options['password']),
+            'batch_size': options['batch_size'],
+            'user_base': self.next_id(User),
+            'post_base': self.next_id(Post),
+            'group_ids': [],
+        }
+
+    def next_id(self, model):
+        # Свои id у строк позволяют процессам ссылаться на пользователей
+        # и посты друг друга, ничего не читая из базы.
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def group_ids(self, plan, count):
+        slugs = [f'{plan["prefix"]}group-{index}' for index in range(count)]
+        ids = dict(Group.objects.filter(slug__in=slugs).values_list(
+            'slug', 'pk'))
+        return [ids[slug] for slug in slugs]
+
+    def run(self, pool, plan, kind, count):
+        if not count:
+            return
+        # Пачка из целых блоков генератора: данные от неё не зависят.
+        size = -(-plan['batch_size'] // seed.BLOCK) * seed.BLOCK
+        chunks = [(start, min(start + size, count))
+                  for start in range(0, count, size)]
+        started = time.perf_counter()
+        rows = 0
+        if pool is None:
+            for start, stop in chunks:
+                rows += seed.insert(plan, kind, start, stop)
+                self.progress(kind, rows, started)
+            return
+        pending = {
+            pool.submit(seed.insert, plan, kind, start, stop)
+            for start, stop in chunks
+        }
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                rows += future.result()
+            self.progress(kind, rows, started)
+
+    def progress(self, kind, rows, started):
+        rate = rows / max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(f'{kind}: {rows} строк, {rate:.0f} строк/с')
+
+    def reset_sequences(self):
+        # Строки вставлены со своими id: счётчики id в PostgreSQL сдвигаются.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Group, Post]):
+                cursor.execute(sql)
+
+    def rebuild(self):
+        self.stdout.write('Пересчёт счётчиков, индексов и лент...')
+        counters.reconcile()
+        blobs.reconcile()
+        search.rebuild()
+        tags.rebuild()
+        timeline.rebuild()
+        feed_cache.bump(feed_cache.ALL)
@@ -0,0 +1,87 @@
+import os
+import shutil
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import delete
+
+from jobs.queue import enqueue
+from posts import thumbnails
+from posts.models import ImageBlob, Post
+from posts.storage import SHARDED, post_images
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога posts/ '
+        'в дерево каталогов по хэшу содержимого и обновляет пути '
+        'в Post.image. Работает пачками, сайт не останавливается; '
+        'прерванный перенос продолжается с того же места.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов переносить за одну выборку.')
+
+    def handle(self, *args, **options):
+        self.moved = self.merged = self.missing = 0
+        started = time.perf_counter()
+        last_pk = 0
+        while True:
+            # Уже перенесённые файлы отсеивает фильтр по имени,
+            # поэтому повторный запуск начинает с оставшихся.
+            batch = list(
+                ImageBlob.objects.exclude(name__regex=SHARDED)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for blob in batch:
+                self.relocate(blob)
+            elapsed = time.perf_counter() - started
+            done = self.moved + self.merged
+            self.stdout.write(
+                f'Перенесено {done} файлов, '
+                f'{done / elapsed:.0f} файлов/с')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перенесено {self.moved}, '
+            f'совпали с уже загруженными {self.merged}, '
+            f'файл не найден {self.missing}'))
+
+    def relocate(self, blob):
+        old = blob.name
+        if not post_images.exists(old):
+            self.missing += 1
+            self.stderr.write(f'Нет файла {old}')
+            return
+        new = post_images.sharded_name(old)
+        # Жёсткая ссылка: файл доступен под обоими именами, пока
+        # посты переключаются на новое, и ничего не копируется.
+        if not post_images.exists(new):
+            os.makedirs(
+                os.path.dirname(post_images.path(new)), exist_ok=True)
+            try:
+                os.link(post_images.path(old), post_images.path(new))
+            except OSError:
+                shutil.copy2(post_images.path(old), post_images.path(new))
+        with transaction.atomic():
+            Post.objects.filter(image=old).update(image=new)
+            existing = ImageBlob.objects.filter(name=new)
+            merged = existing.update(refs=F('refs') + blob.refs)
+            if merged:
+                blob.delete()
+                self.merged += 1
+            else:
+                blob.name = new
+                blob.save(update_fields=('name',))
+                self.moved += 1
+        # Миниатюры старого имени больше никому не нужны.
+        delete(thumbnails.source_file(old), delete_file=False)
+        post_images.delete(old)
+        if not merged:
+            enqueue(thumbnails.build, new)
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:20
+
+from django.db import migrations
+
+TABLE = 'posts_post_search'
+
+SCHEMA = {
+    'sqlite': (
+        (
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            f"text, tokenize='unicode61 remove_diacritics 2')",
+            f'INSERT INTO {TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post',
+        ),
+        (f'DROP TABLE IF EXISTS {TABLE}',),
+    ),
+    'postgresql': (
+        (
+            f'CREATE TABLE {TABLE} ('
+            f'post_id integer PRIMARY KEY REFERENCES posts_post (id) '
+            f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            f'document tsvector NOT NULL)',
+            f"INSERT INTO {TABLE} (post_id, document) "
+            f"SELECT id, to_tsvector('russian', text) FROM posts_post",
+            f'CREATE INDEX {TABLE}_document ON {TABLE} USING gin (document)',
+        ),
+        (f'DROP TABLE IF EXISTS {TABLE}',),
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    for sql in SCHEMA.get(schema_editor.connection.vendor, ((), ()))[0]:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    for sql in SCHEMA.get(schema_editor.connection.vendor, ((), ()))[1]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_auto_20261018_2307'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+# Копии выражений из posts.tags: миграция не должна зависеть
+# от того, как они изменятся потом.
+TAG = re.compile(r'(?<![\w&#])#(\w{1,50})')
+MENTION = re.compile(r'(?<![\w@])@([\w.@+-]{0,149}\w)')
+
+
+def fill_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    TagEntry = apps.get_model('posts', 'TagEntry')
+    Mention = apps.get_model('posts', 'Mention')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    tags = {}
+    users = {}
+    entries = []
+    mentions = []
+    posts = Post.objects.only('text', 'pub_date').order_by().iterator()
+    for post in posts:
+        for name in {name.lower() for name in TAG.findall(post.text)}:
+            if name not in tags:
+                tags[name] = Tag.objects.create(name=name).pk
+            entries.append(TagEntry(
+                tag_id=tags[name], post_id=post.pk, pub_date=post.pub_date))
+        for username in set(MENTION.findall(post.text)):
+            if username not in users:
+                users[username] = User.objects.filter(
+                    username=username).values_list('pk', flat=True).first()
+            if users[username] is not None:
+                mentions.append(Mention(
+                    user_id=users[username], post_id=post.pk,
+                    pub_date=post.pub_date))
+    TagEntry.objects.bulk_create(entries, batch_size=1000)
+    Mention.objects.bulk_create(mentions, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'тег',
+                'verbose_name_plural': 'теги',
+            },
+        ),
+        migrations.CreateModel(
+            name='TagEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_entries', to='posts.Post', verbose_name='Запись')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='posts.Tag', verbose_name='Тег')),
+            ],
+            options={
+                'verbose_name': 'запись с тегом',
+                'verbose_name_plural': 'записи с тегом',
+            },
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='posts.Post', verbose_name='Запись')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to=settings.AUTH_USER_MODEL, verbose_name='Упомянутый')),
+            ],
+            options={
+                'verbose_name': 'упоминание',
+                'verbose_name_plural': 'упоминания',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tagentry',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='tag_entry_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagentry',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_tag_entry'),
+        ),
+        migrations.AddIndex(
+            model_name='mention',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='mention_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mention',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_mention'),
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
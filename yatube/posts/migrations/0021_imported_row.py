@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_comment_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Модель')),
+                ('source_id', models.PositiveIntegerField(verbose_name='id в выгрузке')),
+                ('target_id', models.PositiveIntegerField(verbose_name='id в базе')),
+            ],
+            options={
+                'verbose_name': 'загруженная строка',
+                'verbose_name_plural': 'загруженные строки',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedrow',
+            constraint=models.UniqueConstraint(fields=('model', 'source_id'), name='unique_imported_row_source'),
+        ),
+    ]
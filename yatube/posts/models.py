@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_images
+
 # from core.models import CreatedModel
 
 
@@ -48,17 +50,58 @@ class Post(models.Model):
     image = models.ImageField(
         'картиночка',
         upload_to='posts/',
+        storage=post_images,
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False,
+        help_text='Крошечное превью в data URI, пока грузится картинка',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+
+    COUNTER_FIELDS = ('comments_count',)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'запись'
         verbose_name_plural = 'записи'
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx',
+            ),
+            # Поиск постов по картинке при переносе и удалении файлов.
+            models.Index(fields=('image',), name='post_image_idx'),
+        )
 
     def __str__(self):
         return self.text[0:15]
 
+    def save(self, *args, **kwargs):
+        # Счётчики меняются атомарным UPDATE с F(); полное сохранение
+        # загруженного раньше объекта записало бы поверх старое число.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -82,12 +125,19 @@ class Comment(models.Model):
     created = models.DateTimeField(
         'Дата и время публикации',
         auto_now_add=True,
+        db_index=True,
     )
 
     class Meta:
         ordering = ('-created',)
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return f'комментарий: {self.text[0:15]}'
@@ -110,6 +160,203 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow_user_author',
+            ),
+        )
 
     def __str__(self):
         return f'класс follow: {self.user} подписан на {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Запись во входящей ленте подписчика.
+    Заполняется при публикации поста (fan-out on write),
+    чтобы лента подписок читалась одним диапазоном по индексу."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'запись ленты подписок'
+        verbose_name_plural = 'записи ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_user_post',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'лента {self.user}: {self.post}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя. Обновляются F()-выражениями при изменениях,
+    чтобы страницы не считали агрегаты на каждый запрос."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
+
+    def __str__(self):
+        return f'счётчики {self.user}'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище по содержимому.
+    Одинаковые картинки разных постов лежат одним файлом,
+    refs - сколько постов на него ссылается."""
+    name = models.CharField('Путь в хранилище', max_length=100, unique=True)
+    refs = models.PositiveIntegerField('Ссылок', default=0)
+    created = models.DateTimeField('Загружен', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'файл картинки'
+        verbose_name_plural = 'файлы картинок'
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
+
+
+class Tag(models.Model):
+    """Хэштег из текста постов, например #котики."""
+    name = models.CharField('Тег', max_length=50, unique=True)
+
+    class Meta:
+        verbose_name = 'тег'
+        verbose_name_plural = 'теги'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class TagEntry(models.Model):
+    """Запись обратного индекса: пост с этим тегом.
+    Дата поста продублирована, чтобы лента тега читалась
+    диапазоном по индексу (tag, pub_date), не трогая текст постов."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='entries',
+        verbose_name='Тег'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tag_entries',
+        verbose_name='Запись'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'запись с тегом'
+        verbose_name_plural = 'записи с тегом'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('tag', 'post'),
+                name='unique_tag_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('tag', '-pub_date', '-post'),
+                name='tag_entry_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.tag}: {self.post}'
+
+
+class Mention(models.Model):
+    """Упоминание пользователя в посте через @username."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Упомянутый'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Запись'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'упоминание'
+        verbose_name_plural = 'упоминания'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_mention',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='mention_user_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'@{self.user}: {self.post}'
+
+
+class ImportedRow(models.Model):
+    """Соответствие id строки в выгрузке и id, под которым она
+    загружена. По нему ссылки на загруженные строки переводятся
+    на новые id, а повторная загрузка пропускает уже загруженное."""
+    model = models.CharField('Модель', max_length=100)
+    source_id = models.PositiveIntegerField('id в выгрузке')
+    target_id = models.PositiveIntegerField('id в базе')
+
+    class Meta:
+        verbose_name = 'загруженная строка'
+        verbose_name_plural = 'загруженные строки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('model', 'source_id'),
+                name='unique_imported_row_source',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.model} {self.source_id} -> {self.target_id}'
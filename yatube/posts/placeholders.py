@@ -0,0 +1,46 @@
+import base64
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+def _ratio(alias='card'):
+    geometry, _ = settings.POST_THUMBNAILS[alias]
+    width, height = (int(side) for side in geometry.split('x'))
+    return height / width
+
+
+def make(image):
+    """Размеры картинки и крошечное превью для заглушки.
+    Превью обрезано в пропорциях миниатюры карточки и кодируется
+    в data URI на несколько десятков байт. Возвращает
+    (ширина, высота, data URI) или None, если файл не читается."""
+    width = settings.POST_IMAGE_PLACEHOLDER_WIDTH
+    size = (width, max(1, round(width * _ratio())))
+    # Новая загрузка ещё не сохранена: её потом прочитает хранилище.
+    committed = getattr(image, '_committed', True)
+    try:
+        image.open()
+        try:
+            with Image.open(image) as source:
+                dimensions = source.size
+                # JPEG декодируется сразу в уменьшенном масштабе.
+                source.draft('RGB', (size[0] * 4, size[1] * 4))
+                preview = ImageOps.fit(source.convert('RGB'), size)
+        finally:
+            if committed:
+                image.close()
+            else:
+                image.seek(0)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        logger.warning('Заглушка для %s не построена: %s', image, error)
+        return None
+    format = 'WEBP' if 'WEBP' in Image.SAVE else 'PNG'
+    buffer = BytesIO()
+    preview.save(buffer, format, quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return (*dimensions, f'data:image/{format.lower()};base64,{encoded}')
@@ -0,0 +1,157 @@
+import re
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .utils import NEXT, encode_cursor, split_cursor
+
+TABLE = 'posts_post_search'
+WORD = re.compile(r'\w+')
+# Конфигурация словаря PostgreSQL: стемминг русских словоформ.
+PG_CONFIG = 'russian'
+
+
+def to_match(query):
+    """Запрос пользователя -> выражение MATCH для FTS5.
+    Каждое слово ищется как префикс: "котик" найдёт и "котики".
+    Синтаксис FTS5 из ввода не пропускается."""
+    return ' '.join(f'"{word}"*' for word in WORD.findall(query.lower()))
+
+
+def index(post, created=False):
+    """Добавляет или обновляет пост в индексе поиска.
+    Таблицу индекса создаёт миграция 0018: FTS5 в SQLite,
+    tsvector с GIN-индексом в PostgreSQL. У только что созданного
+    поста старой записи в индексе нет."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            if not created:
+                cursor.execute(
+                    f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {TABLE} (post_id, document) '
+                f'VALUES (%s, to_tsvector(%s, %s)) '
+                f'ON CONFLICT (post_id) DO UPDATE '
+                f'SET document = EXCLUDED.document',
+                [post.pk, PG_CONFIG, post.text])
+
+
+def remove(post_id):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE post_id = %s', [post_id])
+
+
+def rebuild():
+    """Перестраивает индекс по всем постам одним INSERT ... SELECT."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {TABLE}')
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'TRUNCATE {TABLE}')
+            cursor.execute(
+                f'INSERT INTO {TABLE} (post_id, document) '
+                f'SELECT id, to_tsvector(%s, text) '
+                f'FROM {Post._meta.db_table}', [PG_CONFIG])
+    return Post.objects.count()
+
+
+def matching(queryset, query):
+    """Оставляет в queryset посты, найденные по индексу (без ранжирования).
+    На базах без индекса - обычный поиск подстроки."""
+    if connection.vendor == 'sqlite':
+        match = to_match(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match]))
+    if connection.vendor == 'postgresql':
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT post_id FROM {TABLE} '
+            f'WHERE document @@ plainto_tsquery(%s, %s)',
+            [PG_CONFIG, query]))
+    return queryset.filter(text__icontains=query)
+
+
+def _ranked(query, after, limit):
+    """(id поста, ранг) лучших совпадений строго после курсора after.
+    Ранг - "чем меньше, тем лучше", как у bm25 в FTS5."""
+    if connection.vendor == 'sqlite':
+        match = to_match(query)
+        if not match:
+            return []
+        sql = (
+            f'SELECT rowid AS post_id, bm25({TABLE}) AS rank FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s'
+        )
+        params = [match]
+    elif connection.vendor == 'postgresql':
+        sql = (
+            f'SELECT post_id, -ts_rank(document, query) AS rank '
+            f'FROM {TABLE}, plainto_tsquery(%s, %s) query '
+            f'WHERE document @@ query'
+        )
+        params = [PG_CONFIG, query]
+    else:
+        found = matching(Post.objects.order_by('-pk'), query)
+        if after is not None:
+            found = found.filter(pk__lt=after[1])
+        return [(pk, -pk) for pk in found.values_list('pk', flat=True)[:limit]]
+    sql = f'SELECT post_id, rank FROM ({sql}) ranked'
+    if after is not None:
+        sql += ' WHERE rank > %s OR (rank = %s AND post_id > %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, post_id LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _decode(token):
+    """Курсор поиска: (ранг, id) последнего поста страницы."""
+    cursor = split_cursor(token)
+    if cursor is None or cursor[0] != NEXT or len(cursor[1]) != 2:
+        return None
+    rank, pk = cursor[1]
+    try:
+        return float(rank), int(pk)
+    except ValueError:
+        return None
+
+
+class SearchPaginator(Paginator):
+    """Постраничная выдача поиска по рангу: курсор хранит ранг и id
+    последнего поста, следующая страница продолжает с него без OFFSET."""
+
+    def __init__(self, query, per_page):
+        self.query = query
+        super().__init__(Post.objects.none(), per_page)
+
+    def get_page(self, cursor):
+        found = _ranked(self.query, _decode(cursor), self.per_page + 1)
+        has_next = len(found) > self.per_page
+        found = found[:self.per_page]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in found])
+        # Пост мог быть удалён между поиском и выборкой.
+        page = Page(
+            [posts[pk] for pk, _ in found if pk in posts], 1, self)
+        page.previous_cursor = None
+        page.next_cursor = (
+            encode_cursor(NEXT, repr(found[-1][1]), found[-1][0])
+            if has_next else None)
+        page.last_cursor = None
+        return page
@@ -0,0 +1,210 @@
+"""Синтетические данные для seed_yatube.
+
+Каждый блок из BLOCK строк строится своим генератором случайных чисел,
+засеянным (seed, вид строк, начало блока), а id пользователей и постов
+вычисляются из номера строки. Поэтому при одном seed результат
+не зависит ни от размера пачек, ни от числа процессов, ни от порядка,
+в котором они обработали пачки. Популярность авторов, групп, тегов и постов
+распределена по Ципфу: немногие получают большую часть внимания."""
+import io
+import random
+from datetime import timedelta
+from functools import lru_cache
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from .models import Comment, Follow, Group, Post
+from .storage import post_images
+from .transfer import keep_dates
+
+User = get_user_model()
+
+BLOCK = 1000
+# Простое число для перестановки номеров: ранг популярности -> пост.
+SPREAD = 1000003
+IMAGE_SIZE = (640, 480)
+# Доля постов в группах и с тегами.
+GROUP_SHARE = 0.6
+TAG_SHARE = 0.3
+
+
+@lru_cache(maxsize=8)
+def _cum_weights(count, exponent):
+    return list(accumulate(
+        1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def ranks(rng, count, k, exponent):
+    """k номеров из range(count): при exponent > 0 - по Ципфу,
+    ранг 0 самый популярный, при 0 - равномерно."""
+    if not exponent:
+        return [rng.randrange(count) for _ in range(k)]
+    return rng.choices(
+        range(count), cum_weights=_cum_weights(count, exponent), k=k)
+
+
+def spread(rank, count):
+    """Перестановка 0..count-1, чтобы популярные посты не шли подряд."""
+    if count % SPREAD == 0:
+        return rank
+    return rank * SPREAD % count
+
+
+@lru_cache(maxsize=1)
+def _faker():
+    return Faker('ru_RU')
+
+
+def _generators(plan, kind, block):
+    seed = f'{plan["seed"]}:{kind}:{block}'
+    fake = _faker()
+    fake.seed_instance(seed)
+    return random.Random(seed), fake
+
+
+def post_date(plan, index):
+    """Дата поста зависит только от его номера: посты равномерно
+    покрывают период, с небольшим детерминированным сдвигом."""
+    step = plan['span'] / max(plan['posts'], 1)
+    jitter = (index * 2654435761 % 1000) / 1000
+    return plan['start'] + timedelta(seconds=step * (index + jitter))
+
+
+def _image(rng):
+    picture = Image.new('RGB', IMAGE_SIZE, tuple(
+        rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(picture)
+    for _ in range(8):
+        left = rng.randrange(IMAGE_SIZE[0])
+        top = rng.randrange(IMAGE_SIZE[1])
+        draw.ellipse(
+            (left, top, left + rng.randrange(40, 240),
+             top + rng.randrange(40, 240)),
+            fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    picture.save(buffer, 'JPEG', quality=80)
+    return post_images.save('posts/seed.jpg', ContentFile(buffer.getvalue()))
+
+
+def build_users(plan, start, stop):
+    _, fake = _generators(plan, 'users', start)
+    return [
+        User(
+            pk=plan['user_base'] + index,
+            username=f'{plan["prefix"]}{index}',
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password=plan['password'],
+            date_joined=plan['start'],
+        )
+        for index in range(start, stop)
+    ]
+
+
+def build_groups(plan, start, stop):
+    _, fake = _generators(plan, 'groups', start)
+    return [
+        Group(
+            title=fake.catch_phrase()[:200],
+            slug=f'{plan["prefix"]}group-{index}',
+            description=fake.paragraph(),
+        )
+        for index in range(start, stop)
+    ]
+
+
+def build_posts(plan, start, stop):
+    rng, fake = _generators(plan, 'posts', start)
+    count = stop - start
+    authors = ranks(rng, plan['users'], count, plan['zipf'])
+    groups = ranks(rng, len(plan['group_ids']), count, plan['zipf'])
+    posts = []
+    for index, author, group in zip(range(start, stop), authors, groups):
+        text = fake.paragraph(nb_sentences=rng.randint(1, 8))
+        if rng.random() < TAG_SHARE:
+            text += ' ' + ' '.join(
+                f'#{plan["tags"][rank]}' for rank in set(ranks(
+                    rng, len(plan['tags']), rng.randint(1, 3),
+                    plan['zipf'])))
+        post = Post(
+            pk=plan['post_base'] + index,
+            text=text,
+            pub_date=post_date(plan, index),
+            author_id=plan['user_base'] + author,
+            group_id=(
+                plan['group_ids'][group]
+                if plan['group_ids'] and rng.random() < GROUP_SHARE
+                else None),
+        )
+        if spread(index, plan['posts']) < plan['images']:
+            post.image = _image(rng)
+            post.image_width, post.image_height = IMAGE_SIZE
+        posts.append(post)
+    return posts
+
+
+def build_follows(plan, start, stop):
+    """Подписки пользователей start..stop: в среднем plan['follows']
+    на пользователя, авторы по распределению plan['follows_zipf']."""
+    rng, _ = _generators(plan, 'follows', start)
+    follows = []
+    for index in range(start, stop):
+        wanted = min(
+            rng.randint(0, 2 * plan['follows']), plan['users'] - 1)
+        authors = set(ranks(
+            rng, plan['users'], wanted, plan['follows_zipf']))
+        authors.discard(index)
+        follows.extend(
+            Follow(
+                user_id=plan['user_base'] + index,
+                author_id=plan['user_base'] + author,
+            )
+            for author in sorted(authors)
+        )
+    return follows
+
+
+def build_comments(plan, start, stop):
+    rng, fake = _generators(plan, 'comments', start)
+    count = stop - start
+    posts = ranks(rng, plan['posts'], count, plan['zipf'])
+    authors = ranks(rng, plan['users'], count, 0)
+    comments = []
+    for rank, author in zip(posts, authors):
+        index = spread(rank, plan['posts'])
+        comments.append(Comment(
+            post_id=plan['post_base'] + index,
+            author_id=plan['user_base'] + author,
+            text=fake.sentence(nb_words=rng.randint(3, 20)),
+            created=post_date(plan, index) + timedelta(
+                seconds=rng.randrange(3 * 24 * 3600)),
+        ))
+    return comments
+
+
+# Вид строк -> модель, построитель и поля auto_now_add с готовыми датами.
+BUILDERS = {
+    'users': (User, build_users, ()),
+    'groups': (Group, build_groups, ()),
+    'posts': (Post, build_posts, ('pub_date',)),
+    'follows': (Follow, build_follows, ()),
+    'comments': (Comment, build_comments, ('created',)),
+}
+
+
+def insert(plan, kind, start, stop):
+    """Задача пула: строит и вставляет строки start..stop одной
+    транзакцией. start кратен BLOCK. Возвращает число вставленных строк."""
+    model, build, dates = BUILDERS[kind]
+    objects = []
+    for block in range(start, stop, BLOCK):
+        objects.extend(build(plan, block, min(block + BLOCK, stop)))
+    with keep_dates(model, *dates), transaction.atomic():
+        # Размер INSERT выбирает Django под ограничения СУБД.
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+    return len(objects)
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save)
+from django.dispatch import receiver
+
+from . import (
+    blobs, counters, feed_cache, kvstore, placeholders, search, tags,
+    thumbnails, timeline)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+# Поля пользователя, которые выводятся в карточках постов.
+USER_CARD_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, raw=False, update_fields=None,
+                 **kwargs):
+    # Имя автора есть в карточках всех лент. Вход в систему
+    # сохраняет только last_login и ленты не трогает.
+    if created or raw:
+        return
+    if update_fields is None or USER_CARD_FIELDS & set(update_fields):
+        feed_cache.bump(feed_cache.ALL)
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_state(sender, instance, **kwargs):
+    # При смене группы нужно сбросить кэш и старой группы тоже,
+    # а при смене картинки - заново построить миниатюры.
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_text = instance.text
+    instance._loaded_image = instance.image.name
+
+
+@receiver(pre_save, sender=Post)
+def describe_image(sender, instance, raw=False, **kwargs):
+    # Размеры и заглушка считаются один раз, когда картинка меняется.
+    # Несохранённая загрузка, переданная прямо в Post(image=...),
+    # до записи в хранилище носит то же имя, что и при создании.
+    if raw or (instance.image._committed
+               and instance.image.name == instance._loaded_image):
+        return
+    described = placeholders.make(instance.image) if instance.image else None
+    (instance.image_width, instance.image_height,
+     instance.image_placeholder) = described or (None, None, '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        timeline.push_post(instance)
+    if created or instance.text != instance._loaded_text:
+        search.index(instance, created)
+        tags.sync(instance, created)
+    if created or instance.image.name != instance._loaded_image:
+        if not created:
+            blobs.release(instance._loaded_image)
+        # Миниатюры уже загруженной кем-то картинки строить не нужно.
+        if blobs.acquire(instance.image.name):
+            thumbnails.schedule(instance.image)
+    feed_cache.bump(*feed_cache.saved_post_scopes(
+        instance, instance._loaded_group_id))
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_text = instance.text
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, posts_count=-1)
+    blobs.release(instance.image.name)
+    search.remove(instance.pk)
+    feed_cache.bump(*feed_cache.post_scopes(
+        instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.post_id:
+        return
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    # Название группы выводится в карточках всех лент.
+    if not raw:
+        feed_cache.bump(feed_cache.ALL)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        before = timeline.follower_count(instance.author_id)
+        counters.bump_user(instance.user_id, following_count=1)
+        counters.bump_user(instance.author_id, followers_count=1)
+        timeline.follow(instance.user_id, instance.author_id, before)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    before = timeline.follower_count(instance.author_id)
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    timeline.unfollow(instance.user_id, instance.author_id, before)
+
+
+@receiver(request_finished)
+def forget_prefetched_thumbnails(sender, **kwargs):
+    kvstore.clear_prefetched()
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Каталог для недописанных загрузок внутри каталога upload_to.
+INCOMING = 'incoming'
+# Имя файла, уже разложенного по каталогам хэша.
+SHARDED = r'^[^/]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'
+
+
+def blob_name(directory, digest, ext):
+    """posts/ab/cd/abcd...ef.jpg: два уровня каталогов по хэшу,
+    чтобы ни в одном каталоге не скапливались тысячи файлов."""
+    return '/'.join(
+        (directory, digest[:2], digest[2:4], f'{digest}{ext.lower()}'))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - хэш SHA-256 его содержимого.
+    Хэш считается по ходу записи загрузки во временный файл, так что
+    файл читается один раз. Если такой файл уже есть, копия удаляется,
+    а посту достаётся имя существующего."""
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменит хэш, одинаковые имена - это один файл.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1]
+        incoming = self.path(os.path.join(directory, INCOMING))
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            name = blob_name(directory, digest.hexdigest(), ext)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def sharded_name(self, name):
+        """Имя, под которым уже сохранённый файл name лежал бы,
+        если бы был загружен в это хранилище."""
+        directory, filename = os.path.split(name)
+        digest = hashlib.sha256()
+        with self.open(name) as source:
+            for chunk in source.chunks():
+                digest.update(chunk)
+        return blob_name(
+            directory, digest.hexdigest(), os.path.splitext(filename)[1])
+
+
+post_images = ContentAddressedStorage()
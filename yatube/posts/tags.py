@@ -0,0 +1,101 @@
+import re
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+
+from .models import Mention, Post, Tag, TagEntry
+from .utils import CursorPaginator, seek
+
+User = get_user_model()
+
+# # или @ в начале слова; &#x27; из экранированного HTML - не тег.
+TAG = re.compile(r'(?<![\w&#])#(\w{1,50})')
+MENTION = re.compile(r'(?<![\w@])@([\w.@+-]{0,149}\w)')
+
+
+def extract(text):
+    """Теги (в нижнем регистре) и имена упомянутых пользователей."""
+    tags = {name.lower() for name in TAG.findall(text)}
+    usernames = set(MENTION.findall(text))
+    return tags, usernames
+
+
+def _tags(names):
+    """Словарь имя -> id тега, недостающие теги создаются."""
+    existing = dict(
+        Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        # Параллельный запрос мог создать тот же тег: конфликт не ошибка.
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True)
+        existing.update(
+            Tag.objects.filter(name__in=missing).values_list('name', 'pk'))
+    return existing
+
+
+def _insert(posts):
+    """Записи индекса для пачки постов (id, дата, текст): теги
+    и пользователи всей пачки ищутся одним запросом каждые."""
+    parsed = [(pk, date, *extract(text)) for pk, date, text in posts]
+    names = set().union(*(row[2] for row in parsed))
+    usernames = set().union(*(row[3] for row in parsed))
+    if names:
+        tag_ids = _tags(names)
+        TagEntry.objects.bulk_create(
+            TagEntry(tag_id=tag_ids[name], post_id=pk, pub_date=date)
+            for pk, date, post_names, _ in parsed
+            for name in post_names
+        )
+    if usernames:
+        user_ids = dict(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        Mention.objects.bulk_create(
+            Mention(user_id=user_ids[name], post_id=pk, pub_date=date)
+            for pk, date, _, post_usernames in parsed
+            for name in post_usernames
+            if name in user_ids
+        )
+
+
+def sync(post, created=False):
+    """Пересобирает записи индекса тегов и упоминаний для поста.
+    У только что созданного поста удалять ещё нечего."""
+    if not created:
+        TagEntry.objects.filter(post=post).delete()
+        Mention.objects.filter(post=post).delete()
+    _insert([(post.pk, post.pub_date, post.text)])
+
+
+def rebuild(batch_size=1000):
+    """Пересобирает индекс по всем постам пачками.
+    Возвращает число постов."""
+    TagEntry.objects.all().delete()
+    Mention.objects.all().delete()
+    posts = (
+        Post.objects.order_by()
+        .values_list('pk', 'pub_date', 'text')
+        .iterator(batch_size)
+    )
+    count = 0
+    while True:
+        batch = list(islice(posts, batch_size))
+        if not batch:
+            break
+        _insert(batch)
+        count += len(batch)
+    return count
+
+
+class TagPaginator(CursorPaginator):
+    """Лента тега: диапазон обратного индекса по (тег, дата),
+    посты подтягиваются join'ом, текст постов не просматривается."""
+
+    def __init__(self, tag, per_page):
+        self.entries = tag.entries.select_related(
+            'post__author', 'post__group')
+        super().__init__(Post.objects.none(), per_page)
+
+    def _fetch(self, direction, key, limit):
+        entries = seek(self.entries, direction, key, id_field='post_id')
+        return [entry.post for entry in entries[:limit]]
@@ -0,0 +1,23 @@
+from django import template
+
+from posts import feed_cache
+
+register = template.Library()
+
+
+class CachedFeedNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        return feed_cache.render(
+            context.get('request'), self.nodelist, context)
+
+
+@register.tag
+def cached_feed(parser, token):
+    """{% cached_feed %}...{% endcached_feed %}: общая для всех
+    пользователей часть ленты, кэшируется по версиям из cache_feed."""
+    nodelist = parser.parse(('endcached_feed',))
+    parser.delete_first_token()
+    return CachedFeedNode(nodelist)
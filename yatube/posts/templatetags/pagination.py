@@ -0,0 +1,16 @@
+from django import template
+
+from posts.utils import CURSOR_PARAM
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor=None):
+    """Адрес страницы с курсором cursor: остальные параметры текущего
+    адреса, например запрос поиска q, сохраняются."""
+    params = context['request'].GET.copy()
+    params.pop(CURSOR_PARAM, None)
+    if cursor:
+        params[CURSOR_PARAM] = cursor
+    return '?' + params.urlencode()
@@ -0,0 +1,62 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias='card'):
+    """Миниатюра из settings.POST_THUMBNAILS, если фоновая задача
+    её уже построила, иначе None. Шаблон миниатюры не строит."""
+    if not image:
+        return None
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    return thumbnails.lookup(image, geometry, options)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post, alias='card', css_class='card-img my-2', lazy=True):
+    """<picture> с вариантами миниатюры alias по ширинам и форматам:
+    браузер сам выбирает формат, который понимает, и ширину под экран.
+    Последний формат из списка идёт в srcset самого <img>.
+    Размеры <img> заданы сразу, а до загрузки картинки на её месте
+    видна заглушка, так что вёрстка не прыгает.
+
+    Миниатюры только ищутся: пока фоновая задача их не построила,
+    выводится исходная картинка, а варианты без миниатюр пропускаются."""
+    image = post.image
+    if not image:
+        return {'image': None}
+    fallback = post_thumbnail(image, alias)
+    sources = []
+    for format, sizes in thumbnails.variants(alias).items():
+        srcset = [
+            f'{variant.url} {width}w'
+            for variant, width in (
+                (thumbnails.lookup(image, geometry, options), width)
+                for width, geometry, options in sizes)
+            if variant is not None
+        ]
+        if srcset:
+            sources.append({
+                'type': thumbnails.MIME_TYPES.get(format, ''),
+                'srcset': ', '.join(srcset),
+            })
+    img_srcset = sources.pop()['srcset'] if sources else ''
+    # Размеры - из сохранённых в посте, приведённые к геометрии
+    # миниатюры: файл миниатюры для этого не открывается.
+    width, height = thumbnails.thumbnail_size(
+        post.image_width, post.image_height, alias)
+    return {
+        'image': fallback or image,
+        'sources': sources,
+        'srcset': img_srcset,
+        'sizes': settings.POST_IMAGE_SIZES,
+        'css_class': css_class,
+        'width': width,
+        'height': height,
+        'placeholder': post.image_placeholder,
+        'lazy': lazy,
+    }
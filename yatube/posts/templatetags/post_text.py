@@ -0,0 +1,25 @@
+from django import template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from posts.tags import MENTION, TAG
+
+register = template.Library()
+
+
+@register.filter(is_safe=True)
+def linkify(html):
+    """Ссылки на ленты #тегов и профили @упомянутых.
+    Применяется к уже экранированному тексту, после linebreaks."""
+    html = TAG.sub(
+        lambda match: '<a href="{}">{}</a>'.format(
+            reverse('posts:tag_posts', args=(match[1].lower(),)),
+            match[0]),
+        html,
+    )
+    html = MENTION.sub(
+        lambda match: '<a href="{}">{}</a>'.format(
+            reverse('posts:profile', args=(match[1],)), match[0]),
+        html,
+    )
+    return mark_safe(html)
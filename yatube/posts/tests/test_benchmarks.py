@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class BenchmarkViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Comment.objects.create(post=post, author=reader, text='Ответ')
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'result.json')
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark_views', current_db=True, repeat=2, warmup=0,
+            output=self.output, stdout=StringIO(), **options)
+        with open(self.output, encoding='utf-8') as result:
+            return json.load(result)
+
+    def test_report(self):
+        """Для каждой view записаны время, запросы и память,
+        комментарии замера откатываются."""
+        results = self.benchmark()['results']['current']
+        self.assertEqual(len(results), 6)
+        for name, result in results.items():
+            with self.subTest(view=name):
+                self.assertGreater(result['median_ms'], 0)
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['peak_kib'], 0)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_regression_against_baseline(self):
+        """Лишний запрос - регрессия при любом допуске."""
+        report = self.benchmark()
+        report['results']['current']['posts:index']['queries'] -= 1
+        for view in report['results']['current'].values():
+            view['median_ms'] = view['peak_kib'] = 1e9
+        with open(self.output, 'w', encoding='utf-8') as baseline:
+            json.dump(report, baseline)
+        with self.assertRaisesMessage(CommandError, 'posts:index'):
+            call_command(
+                'benchmark_views', current_db=True, repeat=2, warmup=0,
+                baseline=self.output, stdout=StringIO())
@@ -1,22 +1,22 @@
-import shutil
-import tempfile
+import hashlib
+from io import BytesIO
 from http import HTTPStatus
-from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from posts.forms import PostForm
 from posts.models import Comment, Group, Post
 
+from .utils import TempMediaMixin, small_gif
 
-User = get_user_model()
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostCreateFormTests(TestCase):
+class PostCreateFormTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -42,11 +42,6 @@ class PostCreateFormTests(TestCase):
             post=cls.post,
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
         self.authorized_client_author = Client()
         self.authorized_client_author.force_login(self.user_author)
@@ -54,19 +49,7 @@ class PostCreateFormTests(TestCase):
     def test_create_post(self):
         """Валидная форма создает запись в Post."""
         posts_count = Post.objects.count()
-        small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=small_gif,
-            content_type='image/gif'
-        )
+        uploaded = small_gif()
         form_data = {
             'text': 'text_2',
             'group': self.group.id,
@@ -85,7 +68,11 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(first_object.text, 'text_2')
         self.assertEqual(first_object.author, self.user_author)
         self.assertEqual(first_object.group, self.group)
-        self.assertEqual(first_object.image, 'posts/small.gif')
+        with first_object.image.open() as stored:
+            digest = hashlib.sha256(stored.read()).hexdigest()
+        self.assertEqual(
+            first_object.image,
+            f'posts/{digest[:2]}/{digest[2:4]}/{digest}.gif')
 
     def test_create_post_not_for_guest_client(self):
         """Проверяет недоступность страницы создания
@@ -129,7 +116,7 @@ class PostCreateFormTests(TestCase):
         response_2 = self.authorized_client_author.get(
             reverse('posts:post_detail', args=(self.post.id,)))
         self.assertEqual(
-            response_2.context['comments'].first().text, form_data['text'])
+            response_2.context['comments'][0].text, form_data['text'])
 
     def test_comment_not_for_guest_client(self):
         """Проверяет недоступность оставления комментария
@@ -172,3 +159,121 @@ class PostCreateFormTests(TestCase):
         response_2 = self.authorized_client_author.get(
             reverse('posts:group_posts', args=(self.group.slug,)))
         self.assertEqual(len(response_2.context['page_obj']), 0)
+
+
+def image_file(name, format, size=(40, 30), exif=None):
+    buffer = BytesIO()
+    options = {'exif': exif} if exif is not None else {}
+    Image.new('RGB', size, 'red').save(buffer, format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class PostImageUploadTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def form(self, image):
+        return PostForm({'text': 'картинка'}, {'image': image})
+
+    def test_exif_stripped(self):
+        """Метаданные EXIF не попадают в сохранённый файл."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера с координатами'
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'фото',
+            'image': image_file('photo.jpg', 'JPEG', exif=exif.tobytes()),
+        })
+        post = Post.objects.get(author=self.user)
+        with post.image.open() as stored, Image.open(stored) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(len(image.getexif()), 0)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=20)
+    def test_large_image_downscaled(self):
+        """Картинка уменьшается до POST_IMAGE_MAX_SIDE."""
+        form = self.form(image_file('big.png', 'PNG', size=(80, 40)))
+        self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (20, 10))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels(self):
+        """Слишком большая по пикселям картинка отклоняется."""
+        form = self.form(image_file('wide.png', 'PNG'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'too_many_pixels')
+
+    def test_unsupported_format(self):
+        """Форматы не из списка разрешённых отклоняются."""
+        form = self.form(image_file('image.bmp', 'BMP'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'unsupported_format')
+
+    @override_settings(POST_IMAGE_MAX_BYTES=512)
+    def test_upload_truncated(self):
+        """Загрузка больше предела не сохраняется целиком,
+        а форма сообщает об ошибке."""
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'тяжёлая',
+            'image': image_file('heavy.bmp', 'BMP', size=(100, 100)),
+        })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code,
+            'file_too_large')
+
+    def test_dimensions_and_placeholder(self):
+        """При загрузке запоминаются размеры и крошечная заглушка,
+        а лента отдаёт ленивую картинку с этой заглушкой."""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'с заглушкой',
+            'image': image_file('photo.png', 'PNG', size=(40, 30)),
+        })
+        post = Post.objects.get(author=self.user)
+        self.assertEqual((post.image_width, post.image_height), (40, 30))
+        self.assertTrue(post.image_placeholder.startswith('data:image/'))
+        self.assertLess(len(post.image_placeholder), 300)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, post.image_placeholder)
+
+    def admin_upload(self, image):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x')
+        self.client.force_login(admin)
+        return self.client.post(reverse('admin:posts_post_add'), {
+            'text': 'из админки',
+            'author': self.user.pk,
+            'image': image,
+        })
+
+    def test_admin_exif_stripped(self):
+        """Админка очищает картинку так же, как форма на сайте."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера с координатами'
+        response = self.admin_upload(
+            image_file('photo.jpg', 'JPEG', exif=exif.tobytes()))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        post = Post.objects.get(author=self.user)
+        with post.image.open() as stored, Image.open(stored) as image:
+            self.assertEqual(len(image.getexif()), 0)
+
+    @override_settings(POST_IMAGE_MAX_BYTES=512)
+    def test_admin_upload_truncated(self):
+        """Обрезанный файл не сохраняется и через админку."""
+        response = self.admin_upload(
+            image_file('heavy.bmp', 'BMP', size=(100, 100)))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+        self.assertEqual(
+            response.context['adminform'].form.errors.as_data()[
+                'image'][0].code,
+            'file_too_large')
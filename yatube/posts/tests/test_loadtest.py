@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts import loadtest
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class LoadTestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(text='Пост', author=author, group=group)
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'report.json')
+
+    def test_parse_mix(self):
+        self.assertEqual(
+            loadtest.parse_mix('index=3, post'), {'index': 3, 'post': 1})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('index=3,unknown=1')
+
+    def test_report(self):
+        """Все действия смеси выполняются без ошибок, и записи
+        действительно доходят до базы."""
+        call_command(
+            'loadtest', processes=0, concurrency=1, duration=1, warmup=0,
+            mix='index,group,profile,detail,follow_feed,post,comment,follow',
+            output=self.output, stdout=StringIO(), stderr=StringIO())
+        with open(self.output, encoding='utf-8') as report:
+            report = json.load(report)
+        self.assertEqual(set(report), set(loadtest.ACTIONS.values()))
+        for row in report.values():
+            self.assertGreater(row['requests'], 0)
+            self.assertEqual(row['error_rate'], 0)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertGreater(Post.objects.count(), 1)
+        self.assertTrue(Comment.objects.exists())
+
+    def test_needs_data(self):
+        Post.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('loadtest', processes=0, stdout=StringIO())
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded
+from core.queries import query_budget
+from posts.models import Comment, Follow, Group, Post
+
+from .utils import SMALL_GIF, TempMediaMixin, small_gif
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая_группа',
+            slug='test_slug',
+            description='Тестовое_описание',
+        )
+        # Несколько авторов, групп и комментаторов, чтобы N+1
+        # в шаблонах сразу вылез за бюджет.
+        cls.authors = [
+            User.objects.create_user(username=f'Test_author_{number}')
+            for number in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+            for number in range(settings.COUNT_POSTS):
+                # Картинки без построенных миниатюр: фоновая задача
+                # ещё не отработала, а шаблон не должен строить их сам.
+                cls.post = Post.objects.create(
+                    text=f'Тестовый пост {number} #бюджет',
+                    author=author,
+                    group=cls.group,
+                    image=small_gif(f'{number}.gif'),
+                )
+        for author in cls.authors:
+            Comment.objects.create(
+                text='Комментарий', author=author, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.post.author)
+
+    def test_views_fit_query_budgets(self):
+        """Каждая view из posts.views укладывается в свой бюджет."""
+        author = self.authors[0].username
+        cases = (
+            ('posts:index', None, 'get', self.authorized_client),
+            ('posts:post_search', None, 'get', self.authorized_client),
+            ('posts:tag_posts', ('бюджет',), 'get', self.authorized_client),
+            ('posts:group_posts', (self.group.slug,), 'get',
+             self.authorized_client),
+            ('posts:profile', (author,), 'get', self.authorized_client),
+            ('posts:post_detail', (self.post.id,), 'get',
+             self.authorized_client),
+            ('posts:post_comments', (self.post.id,), 'get',
+             self.authorized_client),
+            ('posts:follow_index', None, 'get', self.authorized_client),
+            ('posts:post_create', None, 'post', self.authorized_client),
+            ('posts:post_edit', (self.post.id,), 'post', self.author_client),
+            ('posts:add_comment', (self.post.id,), 'post',
+             self.authorized_client),
+            ('posts:profile_unfollow', (author,), 'get',
+             self.authorized_client),
+            ('posts:profile_follow', (author,), 'get',
+             self.authorized_client),
+        )
+        for url_name, args, method, client in cases:
+            with self.subTest(url_name=url_name):
+                url = reverse(url_name, args=args)
+                with query_budget(url_name):
+                    response = getattr(client, method)(
+                        url, {'text': 'Комментарий', 'q': 'пост'})
+                self.assertLess(response.status_code, 400)
+
+    def test_image_uploads_fit_query_budgets(self):
+        """Создание и правка поста с новой картинкой, новым тегом и
+        сменой группы - самый дорогой путь: файл, размеры, миниатюры,
+        теги."""
+        other_group = Group.objects.create(
+            title='Другая группа', slug='other_slug', description='-')
+        post = self.author_client
+        cases = (
+            ('posts:post_create', None, self.group, SMALL_GIF),
+            # Новая картинка вместо старой и другая группа.
+            ('posts:post_edit', (self.post.id,), other_group,
+             SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x00\xFF', 1)),
+        )
+        for url_name, args, group, content in cases:
+            with self.subTest(url_name=url_name):
+                with query_budget(url_name):
+                    response = post.post(reverse(url_name, args=args), {
+                        'text': f'Пост с картинкой #{url_name[6:]}',
+                        'group': group.pk,
+                        'image': small_gif('new.gif', content),
+                    })
+                self.assertEqual(response.status_code, 302)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.group, other_group)
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 1}, QUERY_BUDGET_RAISE=True)
+    def test_middleware_raises_over_budget(self):
+        """Middleware падает, если view вышла за бюджет."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.authorized_client.get(reverse('posts:index'))
+
+    def test_middleware_keeps_only_count(self):
+        """Middleware на каждом запросе только считает запросы:
+        счётчик один на обе middleware, текст SQL не копится."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        counter = response.wsgi_request.query_counter
+        self.assertGreater(counter.count, 0)
+        self.assertIsNone(counter.queries)
@@ -0,0 +1,92 @@
+import re
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса или сортировка во временном B-дереве.
+BAD_PLAN_STEP = re.compile(
+    r'^SCAN (TABLE )?\w+( AS \w+)?$|USE TEMP B-TREE')
+
+
+@skipUnless(
+    connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Test_reader')
+        cls.user_author = User.objects.create_user(username='Test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая_группа',
+            slug='test_slug',
+            description='Тестовое_описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.user_author)
+        for number in range(settings.COUNT_POSTS + 3):
+            cls.post = Post.objects.create(
+                text=f'Тестовый пост {number}',
+                author=cls.user_author,
+                group=cls.group,
+            )
+        Comment.objects.create(
+            text='Комментарий', author=cls.user, post=cls.post)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, queries):
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            plan = self.explain(sql)
+            for step in plan:
+                self.assertNotRegex(
+                    step, BAD_PLAN_STEP, '\n'.join([sql] + plan))
+
+    def test_views_use_indexes(self):
+        """Запросы каждой ленты и страницы поста идут по индексам:
+        без полного прохода по таблице и без сортировки на лету."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user_author.username,)),
+            reverse('posts:follow_index'),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(page)
+                self.assert_plans_use_indexes(queries)
+                cursor = response.context['page_obj'].next_cursor
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(
+                        page, {'cursor': cursor})
+                self.assert_plans_use_indexes(queries)
+                cursor = response.context['page_obj'].previous_cursor
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(page, {'cursor': cursor})
+                self.assert_plans_use_indexes(queries)
+
+    def test_post_detail_uses_indexes(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(
+                reverse('posts:post_detail', args=(self.post.id,)))
+        self.assert_plans_use_indexes(queries)
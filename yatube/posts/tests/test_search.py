@@ -0,0 +1,109 @@
+import html
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+@skipUnless(
+    connection.vendor in ('sqlite', 'postgresql'),
+    'Полнотекстовый индекс есть только для SQLite и PostgreSQL')
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.rare = Post.objects.create(
+            text='Рецепт борща и немного про котиков', author=cls.user)
+        cls.often = Post.objects.create(
+            text='Котик, котик, котик: всё про котика', author=cls.user)
+        Post.objects.create(text='Про собак', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:post_search'), {'q': query, **params})
+
+    def test_ranked_prefix_search(self):
+        """Находятся словоформы, лучшие совпадения идут первыми."""
+        response = self.search('котик')
+        self.assertEqual(
+            list(response.context['page_obj']), [self.often, self.rare])
+
+    def test_syntax_is_not_injected(self):
+        """Операторы FTS5 из запроса не ломают поиск."""
+        response = self.search('борщ" OR (NEAR')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    @override_settings(COUNT_POSTS=1)
+    def test_cursor_pagination(self):
+        """Вторая страница продолжает выдачу с курсора."""
+        first = self.search('котик').context['page_obj']
+        self.assertEqual(list(first), [self.often])
+        second = self.search(
+            'котик', cursor=first.next_cursor).context['page_obj']
+        self.assertEqual(list(second), [self.rare])
+        self.assertIsNone(second.next_cursor)
+
+    @override_settings(COUNT_POSTS=1)
+    def test_pagination_links(self):
+        """Ссылка на следующую страницу сохраняет запрос, а ссылки
+        без курсора не выводятся."""
+        response = self.search('котик')
+        self.assertNotContains(response, 'cursor=None')
+        self.assertNotContains(response, 'Последняя')
+        link = re.search(
+            r'href="([^"]+)">\s*Следующая', response.content.decode())[1]
+        response = self.client.get(
+            reverse('posts:post_search') + html.unescape(link))
+        self.assertEqual(response.context['query'], 'котик')
+        self.assertEqual(list(response.context['page_obj']), [self.rare])
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        rare = Post.objects.get(pk=self.rare.pk)
+        rare.text = 'Только борщ'
+        rare.save()
+        self.assertEqual(
+            list(self.search('котик').context['page_obj']), [self.often])
+        Post.objects.get(pk=self.often.pk).delete()
+        self.assertEqual(list(self.search('котик').context['page_obj']), [])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт по индексу, а не LIKE по тексту."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@test.ru', 'secret')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'борщ'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.rare])
+        self.assertFalse(
+            [query for query in queries if 'LIKE' in query['sql']])
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+    def test_search_uses_fts_index(self):
+        """Поиск читает индекс FTS5, а не таблицу постов целиком."""
+        with CaptureQueriesContext(connection) as queries:
+            self.search('котик')
+        for query in queries:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'EXPLAIN QUERY PLAN {query["sql"]}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            if 'posts_post_search' in query['sql']:
+                self.assertIn('VIRTUAL TABLE INDEX', ' '.join(plan))
+            self.assertNotIn('SCAN posts_post', plan)
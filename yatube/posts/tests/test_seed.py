@@ -0,0 +1,61 @@
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Post, TagEntry, TimelineEntry
+
+from .utils import TempMediaMixin
+
+User = get_user_model()
+
+
+class SeedTests(TempMediaMixin, TestCase):
+
+    def seed(self, prefix, **options):
+        options = {
+            'users': 50, 'groups': 5, 'posts': 300, 'follows': 5,
+            'comments': 400, 'batch_size': 100, 'prefix': prefix,
+            **options,
+        }
+        call_command('seed_yatube', stdout=StringIO(), **options)
+        return Post.objects.filter(author__username__startswith=prefix)
+
+    def test_counts_and_derived_data(self):
+        """Строки вставлены, счётчики, индексы и ленты пересчитаны."""
+        posts = self.seed('a_', images=3)
+        self.assertEqual(posts.count(), 300)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertEqual(posts.exclude(image='').count(), 3)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TagEntry.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        post = posts.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_popularity_is_skewed(self):
+        """Самый плодовитый автор пишет намного больше среднего."""
+        posts = self.seed('a_')
+        authors = Counter(posts.values_list('author', flat=True))
+        self.assertGreater(max(authors.values()), 5 * 300 / 50)
+
+    def test_same_seed_same_data(self):
+        """При одном seed получаются те же тексты, даты и подписки,
+        размер пачек на результат не влияет."""
+
+        def shape(prefix, **options):
+            posts = self.seed(prefix, **options)
+            follows = Follow.objects.filter(
+                user__username__startswith=prefix).values_list(
+                'user__username', 'author__username')
+            return (
+                list(posts.order_by('pk').values_list('text', 'pub_date')),
+                sorted((user[len(prefix):], author[len(prefix):])
+                       for user, author in follows),
+            )
+
+        self.assertEqual(
+            shape('a_', posts=1500, batch_size=1000),
+            shape('b_', posts=1500, batch_size=2000))
@@ -0,0 +1,101 @@
+import os
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from sorl.thumbnail.models import KVStore
+
+from jobs.models import Job
+from posts import thumbnails
+from posts.models import ImageBlob, Post
+
+from .utils import SMALL_GIF, TempMediaMixin, small_gif
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reposter')
+
+    def create(self, filename):
+        return Post.objects.create(
+            text='репост', author=self.user, image=small_gif(filename))
+
+    def stored_files(self):
+        found = []
+        for root, _, files in os.walk(os.path.join(self.media_root, 'posts')):
+            found.extend(files)
+        return found
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки под разными именами - один файл."""
+        first = self.create('one.gif')
+        second = self.create('two.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).refs, 2)
+
+    def test_thumbnails_scheduled_once(self):
+        """Миниатюры строятся только для новой картинки."""
+        self.create('one.gif')
+        self.create('two.gif')
+        self.assertEqual(
+            Job.objects.filter(name='posts.thumbnails.build').count(), 1)
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется, когда на него не осталось постов."""
+        first = self.create('one.gif')
+        second = self.create('two.gif')
+        name = first.image.name
+        first.delete()
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 1)
+        second.image = ''
+        second.save()
+        call_command('runworker', workers=0, once=True, stdout=StringIO())
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_file_kept_when_uploaded_again(self):
+        """Картинку загрузили снова до запуска задачи удаления:
+        задача не трогает ни файл, ни строку с новой ссылкой."""
+        first = self.create('one.gif')
+        name = first.image.name
+        first.delete()
+        self.create('two.gif')
+        call_command('runworker', workers=0, once=True, stdout=StringIO())
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_shard_images_command(self):
+        """Старые файлы из posts/ переезжают в каталоги по хэшу,
+        одинаковые склеиваются, посты получают новые пути."""
+        directory = os.path.join(self.media_root, 'posts')
+        os.makedirs(directory, exist_ok=True)
+        for filename in ('old.gif', 'copy.gif'):
+            with open(os.path.join(directory, filename), 'wb') as legacy:
+                legacy.write(SMALL_GIF)
+        old = Post.objects.create(
+            text='старый', author=self.user, image='posts/old.gif')
+        copy = Post.objects.create(
+            text='копия', author=self.user, image='posts/copy.gif')
+        fresh = self.create('fresh.gif')
+        thumbnails.render('posts/old.gif')
+        old_key = thumbnails.source_file('posts/old.gif').key
+        self.assertTrue(KVStore.objects.filter(key__contains=old_key))
+        call_command('shard_images', stdout=StringIO())
+        # Сведения о миниатюрах старого имени удалены вместе с ними.
+        self.assertFalse(KVStore.objects.filter(key__contains=old_key))
+        old.refresh_from_db()
+        copy.refresh_from_db()
+        self.assertEqual(old.image.name, fresh.image.name)
+        self.assertEqual(copy.image.name, fresh.image.name)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(ImageBlob.objects.get().refs, 3)
+        out = StringIO()
+        call_command('shard_images', stdout=out)
+        self.assertIn('перенесено 0', out.getvalue())
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import tags
+from posts.models import Mention, Post, Tag, TagEntry
+from posts.utils import NEXT, seek
+
+User = get_user_model()
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='tagger')
+        cls.friend = User.objects.create_user(username='leo.k')
+        now = timezone.now()
+        cls.posts = []
+        for hours, text in enumerate((
+            'Третий про #Котики',
+            'Второй про #котики и #борщ',
+            'Первый про #котики, привет @leo.k!',
+        )):
+            post = Post.objects.create(text=text, author=cls.user)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(hours=hours))
+            cls.posts.append(post)
+        # Даты сдвинуты мимо сигналов: индекс пересобирается заново.
+        tags.rebuild()
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self, name, **params):
+        return self.client.get(reverse('posts:tag_posts', args=(name,)),
+                               params)
+
+    def test_extract(self):
+        """Теги приводятся к нижнему регистру, почта и HTML не тег."""
+        self.assertEqual(
+            tags.extract(
+                '#Python и #python, a@b.ru, &#x27;цитата&#x27;, @ann_1.'),
+            ({'python'}, {'ann_1'}),
+        )
+
+    def test_tag_feed(self):
+        """Лента тега идёт от новых к старым, регистр не важен."""
+        response = self.feed('КОТИКИ')
+        self.assertEqual(
+            list(response.context['page_obj']), self.posts)
+        self.assertContains(
+            response, f'href="{reverse("posts:profile", args=("leo.k",))}"')
+
+    def test_unknown_tag(self):
+        self.assertEqual(self.feed('нет-такого').status_code, 404)
+
+    @override_settings(COUNT_POSTS=2)
+    def test_cursor_pagination(self):
+        first = self.feed('котики').context['page_obj']
+        self.assertEqual(list(first), self.posts[:2])
+        second = self.feed(
+            'котики', cursor=first.next_cursor).context['page_obj']
+        self.assertEqual(list(second), self.posts[2:])
+        self.assertIsNone(second.next_cursor)
+        back = self.feed(
+            'котики', cursor=second.previous_cursor).context['page_obj']
+        self.assertEqual(list(back), self.posts[:2])
+
+    def test_mentions(self):
+        """Упоминания сохраняются только для существующих пользователей."""
+        self.assertEqual(
+            list(self.friend.mentions.values_list('post', flat=True)),
+            [self.posts[2].pk],
+        )
+        Post.objects.create(text='@nobody тут?', author=self.user)
+        self.assertEqual(Mention.objects.count(), 1)
+
+    def test_index_follows_changes(self):
+        """Правка текста переносит пост между тегами, удаление - убирает."""
+        post = Post.objects.get(pk=self.posts[1].pk)
+        post.text = 'Теперь только #суп'
+        post.save()
+        self.assertEqual(list(self.feed('суп').context['page_obj']), [post])
+        self.assertEqual(
+            list(self.feed('борщ').context['page_obj']), [])
+        post.delete()
+        self.assertFalse(
+            TagEntry.objects.filter(tag__name='суп').exists())
+
+    def test_untouched_text_is_not_reindexed(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        with CaptureQueriesContext(connection) as queries:
+            post.save(update_fields=('group',))
+        self.assertFalse(any(
+            'posts_tagentry' in query['sql']
+            for query in queries.captured_queries))
+
+    def test_feed_does_not_scan_posts(self):
+        """Лента тега читается по индексу тегов, без перебора постов."""
+        tag = Tag.objects.get(name='котики')
+        paginator = tags.TagPaginator(tag, 2)
+        plan = seek(
+            paginator.entries, NEXT, None, id_field='post_id')[:3].explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('tag_entry_date_idx', plan)
+            self.assertNotIn('SCAN posts_post', plan)
@@ -0,0 +1,103 @@
+import os
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import kvstore, thumbnails
+from posts.models import Post
+
+from .utils import TempMediaMixin, small_gif
+
+User = get_user_model()
+
+
+class ThumbnailsTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumbs')
+        cls.post = Post.objects.create(
+            text='пост с картинкой',
+            author=cls.user,
+            image=small_gif('thumb.gif'),
+        )
+
+    def thumbnail_files(self):
+        found = []
+        for _, _, files in os.walk(os.path.join(self.media_root, 'cache')):
+            found.extend(files)
+        return found
+
+    def test_generate_thumbnails_command(self):
+        """Команда строит миниатюры и заглушки для уже
+        опубликованных постов."""
+        Post.objects.update(
+            image_width=None, image_height=None, image_placeholder='')
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (2, 1))
+        self.assertTrue(self.post.image_placeholder)
+        files = self.thumbnail_files()
+        # Миниатюра карточки совпадает с вариантом JPEG той же ширины.
+        self.assertGreaterEqual(
+            len(files),
+            len(settings.POST_IMAGE_WIDTHS) * len(thumbnails.formats()))
+        self.assertEqual(
+            len([name for name in files if name.endswith('.webp')]),
+            len(settings.POST_IMAGE_WIDTHS))
+
+    def test_picture_before_thumbnails(self):
+        """Пока миниатюр нет, страница отдаёт исходную картинку
+        с размерами будущей миниатюры и не строит миниатюры сама."""
+        cache.clear()
+        built = sorted(self.thumbnail_files())
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        # Картинка 2x1 в карточке 960x339 с обрезкой по центру.
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertNotContains(response, '<source')
+        self.assertEqual(sorted(self.thumbnail_files()), built)
+
+    def test_picture_markup(self):
+        """Карточка поста отдаёт <picture> с вариантами в WebP."""
+        cache.clear()
+        thumbnails.render(self.post.image.name)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.id,)))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '480w')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, '<picture>', 1)
+
+    def test_page_thumbnails_prefetched(self):
+        """Сведения о миниатюрах страницы читаются одним запросом,
+        а рендер карточек не строит миниатюры заново."""
+        # В кэше могут остаться ключи предыдущих тестов,
+        # чьи строки в БД уже откатились.
+        cache.clear()
+        thumbnails.render(self.post.image.name)
+        built = sorted(self.thumbnail_files())
+        cache.clear()
+        before = kvstore.stats()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        after = kvstore.stats()
+        kv_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kv_queries), 1)
+        self.assertEqual(sorted(self.thumbnail_files()), built)
+        self.assertEqual(
+            after.get('prefetch_hits', 0) - before.get('prefetch_hits', 0),
+            len(list(thumbnails.all_thumbnails())))
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, TagEntry
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа', slug='group')
+        cls.date = timezone.make_aware(datetime(2021, 5, 1, 12))
+        for number in range(5):
+            post = Post.objects.create(
+                text=f'Пост {number} #перенос', author=cls.author,
+                group=group if number % 2 else None)
+            Comment.objects.create(
+                post=post, author=cls.reader, text=f'Комментарий {number}')
+        Post.objects.update(pub_date=cls.date)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, f'{name}.jsonl')
+
+    def call(self, *args, **options):
+        call_command(*args, stdout=StringIO(), stderr=StringIO(), **options)
+
+    def export(self, *names, **options):
+        for name in names:
+            self.call(f'export_{name}', output=self.path(name),
+                      batch_size=2, **options)
+
+    def test_round_trip(self):
+        """Выгруженное загружается обратно с теми же id, датами
+        и производными данными."""
+        names = ('posts', 'comments', 'follows')
+        self.export(*names)
+        before = list(Comment.objects.values_list(
+            'pk', 'post_id', 'author_id', 'text', 'created'))
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        for name in names:
+            self.call(f'import_{name}', self.path(name), batch_size=2)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertFalse(Post.objects.exclude(pub_date=self.date).exists())
+        self.assertEqual(Post.objects.filter(group__isnull=False).count(), 2)
+        self.assertEqual(list(Comment.objects.values_list(
+            'pk', 'post_id', 'author_id', 'text', 'created')), before)
+        self.assertEqual(Post.objects.filter(comments_count=1).count(), 5)
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).stats.followers_count, 1)
+        self.assertEqual(TagEntry.objects.count(), 5)
+
+    def test_import_is_idempotent(self):
+        """Повторная загрузка того же файла ничего не дублирует,
+        строки без автора в базе пропускаются."""
+        self.export('posts', 'comments')
+        Post.objects.all().delete()
+        self.call('import_posts', self.path('posts'))
+        with open(self.path('comments'), 'a', encoding='utf-8') as data:
+            data.write(json.dumps({
+                'id': 999, 'post': Post.objects.first().pk,
+                'author': 'ghost', 'text': '?', 'created': None,
+            }) + '\n')
+        for _ in range(2):
+            self.call('import_comments', self.path('comments'), skip=1)
+        self.assertEqual(Comment.objects.count(), 4)
+
+    def test_import_into_database_with_posts(self):
+        """Занятые id получают новые, комментарии цепляются к своим
+        постам, а не к чужим с тем же id; отчёт считает такие строки
+        отдельно от пропущенных."""
+        self.export('posts', 'comments', 'follows')
+        old_posts = set(Post.objects.values_list('pk', flat=True))
+        out = StringIO()
+        call_command('import_posts', self.path('posts'), stderr=out)
+        self.assertIn(
+            'Загружено 5 строк, из них под новым id: 5', out.getvalue())
+        self.call('import_comments', self.path('comments'))
+        out = StringIO()
+        call_command('import_follows', self.path('follows'), stderr=out)
+        self.assertIn('уже есть в базе - 1', out.getvalue())
+        self.assertEqual(Post.objects.count(), 10)
+        self.assertEqual(Follow.objects.count(), 1)
+        for comment in Comment.objects.exclude(post__in=old_posts):
+            # «Пост N #перенос» и «Комментарий N».
+            self.assertEqual(
+                comment.post.text.split()[1], comment.text.split()[1])
+        self.assertEqual(
+            Post.objects.exclude(pk__in=old_posts)
+            .filter(comments_count=1).count(), 5)
+        out = StringIO()
+        call_command('import_posts', self.path('posts'), stderr=out)
+        self.assertIn('загружены раньше - 5', out.getvalue())
+        self.assertEqual(Post.objects.count(), 10)
+
+    def test_export_resumes_after_last_id(self):
+        """--resume дописывает только новые строки, обрывок
+        последней строки отбрасывается."""
+        self.export('posts')
+        with open(self.path('posts'), 'a', encoding='utf-8') as data:
+            data.write('{"id": 10')
+        Post.objects.create(text='Новый', author=self.author)
+        self.export('posts', resume=True)
+        with open(self.path('posts'), encoding='utf-8') as data:
+            ids = [json.loads(line)['id'] for line in data]
+        self.assertEqual(ids, list(
+            Post.objects.order_by('pk').values_list('pk', flat=True)))
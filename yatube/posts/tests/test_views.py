@@ -1,18 +1,27 @@
+from io import StringIO
+
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
-from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from time import sleep
 
-from posts.models import Follow, Group, Post
+from posts import thumbnails
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, UserStats
+)
+
+from .utils import TempMediaMixin, small_gif
 
 User = get_user_model()
 
 
-class VievFunctionTest(TestCase):
+class VievFunctionTest(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -28,19 +37,7 @@ class VievFunctionTest(TestCase):
             slug='test_slug_2',
             description='Тестовое_описание_2',
         )
-        cls.small_gif = (
-            b'\x47\x49\x46\x38\x39\x61\x02\x00'
-            b'\x01\x00\x80\x00\x00\x00\x00\x00'
-            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
-            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
-            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
-            b'\x0A\x00\x3B'
-        )
-        cls.uploaded = SimpleUploadedFile(
-            name='small.gif',
-            content=cls.small_gif,
-            content_type='image/gif'
-        )
+        cls.uploaded = small_gif()
         cls.follow = Follow.objects.create(
             user=cls.user,
             author=cls.user_author,
@@ -127,22 +124,55 @@ class VievFunctionTest(TestCase):
                 self.assertIsInstance(object, expected)
 
     def test_cashe(self):
-        """тестирует кэш"""
-        posts_count = Post.objects.count()
-        post_1 = Post.objects.create(
-            text='Test_text',
-            author=self.user_author,
-            group=self.group
+        """Ленты кэшируются до изменения постов и групп, а кэш
+        ленты общий для всех пользователей."""
+        card = 'posts/includes/post_card.html'
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.user_author.username,)),
         )
-        self.assertEqual(Post.objects.count(), posts_count + 1)
-        response_1 = self.authorized_client_author.get(reverse('posts:index'))
-        post_1.delete()
-        response_2 = self.authorized_client_author.get(reverse('posts:index'))
-        self.assertEqual(response_1.content, response_2.content)
-        self.assertEqual(Post.objects.count(), posts_count)
-        cache.clear()
-        response_3 = self.authorized_client_author.get(reverse('posts:index'))
-        self.assertNotEqual(response_1.content, response_3.content)
+        changes = (
+            lambda: Post.objects.create(
+                text='Test_text', author=self.user_author, group=self.group),
+            lambda: Group.objects.filter(pk=self.group.pk).first().save(),
+            lambda: Post.objects.filter(text='Test_text').delete(),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                response_1 = self.authorized_client_author.get(page)
+                self.assertTemplateUsed(response_1, card)
+                for change in changes:
+                    # Из кэша лента отдаётся без рендеринга карточек,
+                    # в том числе другому пользователю.
+                    for client in (self.authorized_client_author,
+                                   self.authorized_client, Client()):
+                        response_2 = client.get(page)
+                        self.assertTemplateNotUsed(response_2, card)
+                    # Шапка страницы своя у каждого пользователя.
+                    self.assertContains(
+                        response_2, reverse('users:login'))
+                    change()
+                    response_3 = self.authorized_client_author.get(page)
+                    self.assertTemplateUsed(response_3, card)
+                Comment.objects.create(
+                    text='Комментарий', author=self.user, post=self.post)
+                self.assertTemplateNotUsed(
+                    self.authorized_client_author.get(page), card)
+
+    def test_cashe_dropped_on_rename_and_thumbnails(self):
+        """Кэш лент сбрасывается, когда автор меняет имя и когда
+        фоновая задача построила миниатюры картинок постов."""
+        page = reverse('posts:index')
+        self.authorized_client.get(page)
+        self.user_author.first_name = 'Переименованный'
+        self.user_author.save()
+        self.assertContains(
+            self.authorized_client.get(page), 'Переименованный')
+        thumbnails.build(self.post.image.name)
+        response = self.authorized_client.get(page)
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        self.assertContains(response, '/media/cache/')
 
     def test_pages_accept_correct_context_follow_index(self):
         """проверка правильности передаваемого
@@ -200,6 +230,168 @@ class VievFunctionTest(TestCase):
         # Тут я написал ещё один тест-кейс (перечитал задание)
         # собственно формулировка задания теперь докстринг к тесту.
 
+    def test_timeline_follows_subscriptions(self):
+        """Входящая лента дополняется при подписке, чистится при отписке
+        и заново собирается командой rebuild_timelines."""
+        timeline = self.user.timeline
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)), [self.post.pk])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(
+                self.user_author.username,)))
+        self.assertFalse(timeline.exists())
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(
+                self.user_author.username,)))
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)), [self.post.pk])
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)), [self.post.pk])
+
+    def test_timeline_rebuild_atomic(self):
+        """Если вставка при пересборке упала, старые ленты остаются."""
+        with override_settings(TIMELINE_CELEBRITY_FOLLOWERS=object()):
+            with self.assertRaises(Exception):
+                call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(self.user.timeline.values_list('post', flat=True)),
+            [self.post.pk])
+
+    def test_counters_follow_changes(self):
+        """Счётчики обновляются при комментарии, подписке и отписке."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(
+                self.user_author.username,)))
+        self.user_author.stats.refresh_from_db()
+        self.assertEqual(self.user_author.stats.followers_count, 0)
+        self.user.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 0)
+        self.assertEqual(self.user_author.stats.posts_count, 1)
+
+    def test_edit_keeps_comments_count(self):
+        """Правка поста, загруженного до нового комментария,
+        не затирает счётчик комментариев."""
+        stale = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            text='комментарий', author=self.user, post=self.post)
+        stale.text = 'Исправленный текст'
+        stale.save()
+        edited = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(edited.text, 'Исправленный текст')
+        self.assertEqual(edited.comments_count, 1)
+
+    def test_counters_do_not_go_negative(self):
+        """Разошедшийся нулевой счётчик не уходит в минус и не
+        роняет отписку."""
+        UserStats.objects.update(followers_count=0, following_count=0)
+        response = self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(
+                self.user_author.username,)))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user_author).followers_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.user).following_count, 0)
+
+    def test_pages_without_aggregate_queries(self):
+        """Профиль и страница поста не считают агрегаты."""
+        pages = (
+            reverse('posts:profile', args=(self.user_author.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(page)
+                for query in queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_reconcile_counters(self):
+        """Команда reconcile_counters чинит разошедшиеся счётчики."""
+        UserStats.objects.update(posts_count=42, followers_count=0)
+        Post.objects.update(comments_count=5)
+        call_command('reconcile_counters', stdout=StringIO())
+        stats = UserStats.objects.get(user=self.user_author)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comments_count, 0)
+
+    @override_settings(COUNT_COMMENTS=3)
+    def test_comments_paginated_without_n_plus_one(self):
+        """Комментарии отдаются порциями, число запросов не растёт
+        с числом комментариев, следующая порция - HTML-фрагментом."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        Comment.objects.create(text='первый', author=self.user, post=self.post)
+        # Первый рендер создаёт миниатюру картинки - прогреваем.
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.authorized_client.get(url)
+        for number in range(4):
+            Comment.objects.create(
+                text=f'комментарий {number}',
+                author=self.user_author,
+                post=self.post,
+            )
+        with CaptureQueriesContext(connection) as many:
+            response = self.authorized_client.get(url)
+        self.assertEqual(len(few), len(many))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            ['комментарий 3', 'комментарий 2', 'комментарий 1'])
+        response = self.authorized_client.get(
+            reverse('posts:post_comments', args=(self.post.id,)),
+            {'cursor': comments.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['комментарий 0', 'первый'])
+        self.assertIsNone(response.context['comments'].next_cursor)
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_timeline_merges_celebrity_posts(self):
+        """Посты знаменитостей не раскладываются по лентам,
+        а подмешиваются при чтении в общем порядке по дате."""
+        author_2 = User.objects.create_user(username='Test_author_2')
+        Follow.objects.create(user=self.user, author=author_2)
+        pushed = Post.objects.create(text='обычный автор', author=author_2)
+        Follow.objects.create(
+            user=User.objects.create_user(username='Test_fan'),
+            author=self.user_author,
+        )
+        pulled = Post.objects.create(
+            text='знаменитость', author=self.user_author)
+        self.assertFalse(self.user_author.posts.filter(
+            timeline_entries__isnull=False).exists())
+        self.assertTrue(pushed.timeline_entries.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [pulled, pushed, self.post])
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=2)
+    def test_timeline_backfilled_after_celebrity(self):
+        """Автор опустился ниже порога: его посты раскладываются
+        оставшимся подписчикам фоновой задачей, а не в запросе."""
+        fan = User.objects.create_user(username='Test_fan')
+        Follow.objects.create(user=fan, author=self.user_author)
+        self.assertFalse(self.user.timeline.exists())
+        Follow.objects.filter(user=fan).delete()
+        self.assertFalse(self.user.timeline.exists())
+        call_command('runworker', workers=0, once=True, stdout=StringIO())
+        self.assertEqual(
+            list(self.user.timeline.values_list('post', flat=True)),
+            [self.post.pk])
+
 
 class VievPaginatorTest(TestCase):
     @classmethod
@@ -241,6 +433,29 @@ class VievPaginatorTest(TestCase):
                 response = self.authorized_client_author.get(page)
                 self.assertEqual(len(response.context['page_obj']), (
                     settings.COUNT_POSTS))
-                response_2 = self.authorized_client.get(page + '?page=2')
+                next_cursor = response.context['page_obj'].next_cursor
+                response_2 = self.authorized_client.get(
+                    page, {'cursor': next_cursor})
                 self.assertEqual(len(response_2.context['page_obj']), (
                     self.COUNT_POST_FOR_TEST - settings.COUNT_POSTS))
+                self.assertIsNone(response_2.context['page_obj'].next_cursor)
+
+    def test_cursor_paginator_goes_back(self):
+        """Курсор "Предыдущая" возвращает ровно первую страницу,
+        а испорченный курсор отдаёт первую страницу."""
+        page = reverse('posts:index')
+        first = self.authorized_client.get(page).context['page_obj']
+        self.assertIsNone(first.previous_cursor)
+        second = self.authorized_client.get(
+            page, {'cursor': first.next_cursor}).context['page_obj']
+        back = self.authorized_client.get(
+            page, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertIsNone(back.previous_cursor)
+        broken = self.authorized_client.get(
+            page, {'cursor': 'мусор'}).context['page_obj']
+        self.assertEqual(list(broken), list(first))
+        last = self.authorized_client.get(
+            page, {'cursor': first.last_cursor}).context['page_obj']
+        self.assertEqual(list(last)[-len(second):], list(second))
+        self.assertIsNone(last.next_cursor)
@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults, settings as sorl_settings
+from sorl.thumbnail.helpers import toint
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from . import placeholders
+from .storage import post_images
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+def formats():
+    """Форматы из settings.POST_IMAGE_FORMATS, которые можно сохранить."""
+    from PIL import Image
+    from sorl.thumbnail.base import EXTENSIONS
+    Image.init()
+    available = []
+    for name in settings.POST_IMAGE_FORMATS:
+        if name not in Image.SAVE:
+            continue
+        # sorl-thumbnail не знает расширения для AVIF.
+        EXTENSIONS.setdefault(name, name.lower())
+        available.append(name)
+    return available
+
+
+def variants(alias='card'):
+    """Варианты миниатюры alias: {формат: [(ширина, геометрия, опции)]}.
+    Пропорции и обрезка берутся из settings.POST_THUMBNAILS[alias]."""
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    width, height = (int(side) for side in geometry.split('x'))
+    return {
+        format: [
+            (
+                size,
+                f'{size}x{round(size * height / width)}',
+                dict(options, format=format),
+            )
+            for size in settings.POST_IMAGE_WIDTHS
+        ]
+        for format in formats()
+    }
+
+
+def all_thumbnails():
+    """Все (геометрия, опции) миниатюр поста вместе с вариантами."""
+    for alias, (geometry, options) in settings.POST_THUMBNAILS.items():
+        yield geometry, options
+        for sizes in variants(alias).values():
+            for _, variant, variant_options in sizes:
+                yield variant, variant_options
+
+
+def thumbnail_size(width, height, alias='card'):
+    """Размер миниатюры alias для картинки width x height без чтения
+    файлов: масштаб и обрезка считаются так же, как в движке sorl.
+    Для картинки без сохранённых размеров - (None, None)."""
+    if not width or not height:
+        return None, None
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    crop = options.get('crop')
+    x, y = parse_geometry(geometry, width / height)
+    factor = (max if crop else min)(x / width, y / height)
+    if factor < 1 or options.get('upscale', sorl_settings.THUMBNAIL_UPSCALE):
+        width, height = toint(width * factor), toint(height * factor)
+    if crop and crop != 'noop':
+        width, height = min(width, x), min(height, y)
+    return width, height
+
+
+def source_file(name):
+    # Ключ sorl зависит от хранилища: берём то же, что у Post.image,
+    # иначе шаблон не найдёт построенные здесь миниатюры.
+    return ImageFile(name, post_images)
+
+
+def render(name):
+    """Строит все миниатюры из settings.POST_THUMBNAILS для картинки
+    и все их варианты по ширинам и форматам."""
+    source = source_file(name)
+    for geometry, options in all_thumbnails():
+        get_thumbnail(source, geometry, **options)
+    return name
+
+
+def prepare(name):
+    """Задача пула generate_thumbnails: миниатюры, размеры и заглушка."""
+    render(name)
+    return name, placeholders.make(post_images.open(name))
+
+
+def _thumbnail_file(image, geometry, options):
+    """Файл миниатюры, как его назвал бы get_thumbnail."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def thumbnail_key(image, geometry, options):
+    """Ключ миниатюры в хранилище sorl, как его считает get_thumbnail."""
+    return _thumbnail_file(image, geometry, options).key
+
+
+def lookup(image, geometry, options):
+    """Готовая миниатюра или None, если фоновая задача её ещё
+    не построила. В отличие от get_thumbnail, ничего не строит:
+    только читает хранилище ключей sorl (обычно из предзагрузки)."""
+    return default.kvstore.get(_thumbnail_file(image, geometry, options))
+
+
+def prefetch(posts):
+    """Загружает сведения о миниатюрах всех постов страницы одним
+    обращением к кэшу, чтобы карточки рендерились без запросов."""
+    if not hasattr(default.kvstore, 'prefetch'):
+        return
+    thumbnails = list(all_thumbnails())
+    default.kvstore.prefetch([
+        thumbnail_key(post.image, geometry, options)
+        for post in posts if post.image
+        for geometry, options in thumbnails
+    ])
+
+
+def setup_worker(media_root):
+    """Готовит рабочий процесс пула: отдельная копия Django без БД.
+    Хранилище ключей sorl переводится на свой файл dbm, так что процесс
+    только пишет файлы миниатюр. Запись о миниатюре в БД потом делает
+    первый рендер страницы, не трогая саму картинку."""
+    import django
+    settings.MEDIA_ROOT = media_root
+    settings.THUMBNAIL_KVSTORE = (
+        'sorl.thumbnail.kvstores.dbm_kvstore.KVStore')
+    settings.THUMBNAIL_DBM_FILE = os.path.join(
+        tempfile.mkdtemp(prefix='thumbnails-'), 'kvstore')
+    django.setup()
+
+
+def make_pool(workers):
+    # spawn, а не fork: дочерний процесс не наследует соединения с БД.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=setup_worker,
+        initargs=(settings.MEDIA_ROOT,),
+    )
+
+
+def build(name):
+    """Фоновая задача: миниатюры картинки и сброс лент с её постами.
+    Карточки, нарисованные до миниатюр, ссылаются на исходный файл,
+    и без сброса так и остались бы в кэше лент."""
+    from . import feed_cache
+    render(name)
+    feed_cache.bump_image(name)
+    return name
+
+
+def schedule(image):
+    """Ставит построение миниатюр в очередь фоновых задач."""
+    # Модуль грузится в процессах пула до django.setup(),
+    # поэтому модели очереди импортируем только здесь.
+    from jobs.queue import enqueue
+    if image:
+        enqueue(build, image.name)
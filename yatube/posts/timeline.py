@@ -0,0 +1,186 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from jobs.queue import enqueue
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import NEXT, CursorPaginator, seek
+
+BATCH_SIZE = 1000
+
+
+def follower_count(author_id):
+    return (
+        UserStats.objects.filter(pk=author_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    ) or 0
+
+
+def is_celebrity(author_id, count=None):
+    """Посты авторов с большой аудиторией не раскладываются по лентам,
+    а подтягиваются при чтении."""
+    if count is None:
+        count = follower_count(author_id)
+    return count >= settings.TIMELINE_CELEBRITY_FOLLOWERS
+
+
+def celebrities_followed_by(user_id):
+    return Follow.objects.filter(
+        user_id=user_id,
+        author__stats__followers_count__gte=(
+            settings.TIMELINE_CELEBRITY_FOLLOWERS),
+    ).values_list('author_id', flat=True)
+
+
+def _bulk_insert(entries):
+    # Режем генератор на пачки, чтобы не держать в памяти всю ленту;
+    # размер пачки внутри bulk_create подбирает бэкенд БД.
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def push_post(post):
+    """Раскладывает новый пост во входящие ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in follower_ids
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика все посты нового автора."""
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')
+        .iterator()
+    )
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow(user_id, author_id, before):
+    """before - число подписчиков автора до этой подписки. Порог
+    ловится сравнением до и после, а не точным равенством: при
+    одновременных подписках счётчик может перескочить порог."""
+    threshold = settings.TIMELINE_CELEBRITY_FOLLOWERS
+    count = follower_count(author_id)
+    if before < threshold <= count:
+        # Автор только что стал знаменитостью: дальше его посты
+        # читаются напрямую, разложенные копии больше не нужны.
+        TimelineEntry.objects.filter(author_id=author_id).delete()
+    if not is_celebrity(author_id, count):
+        backfill(user_id, author_id)
+
+
+def unfollow(user_id, author_id, before):
+    trim(user_id, author_id)
+    threshold = settings.TIMELINE_CELEBRITY_FOLLOWERS
+    if follower_count(author_id) < threshold <= before:
+        # Автор перестал быть знаменитостью: посты нужно разложить
+        # всем оставшимся подписчикам, это долго для запроса.
+        enqueue(backfill_followers, author_id)
+
+
+def backfill_followers(author_id):
+    """Фоновая задача: раскладывает посты автора, переставшего быть
+    знаменитостью, оставшимся подписчикам, иначе они пропадут из
+    их лент. Если автор успел снова набрать подписчиков, делать
+    ничего не нужно."""
+    if is_celebrity(author_id):
+        return
+    follower_ids = (
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+    for follower_id in follower_ids:
+        backfill(follower_id, author_id)
+
+
+def rebuild():
+    """Пересобирает все входящие ленты с нуля по таблице подписок
+    одним INSERT ... SELECT, без передачи строк через Python.
+    Опирается на счётчики подписчиков: их пересчитывает reconcile.
+    Удаление и вставка - одна транзакция: читатели не видят пустых
+    лент, а при ошибке остаются старые."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.all().delete()
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            f'ON post.author_id = follow.author_id '
+            f'LEFT JOIN {UserStats._meta.db_table} stats '
+            f'ON stats.user_id = follow.author_id '
+            f'WHERE COALESCE(stats.followers_count, 0) < %s',
+            [settings.TIMELINE_CELEBRITY_FOLLOWERS])
+    return TimelineEntry.objects.count()
+
+
+def _sort_key(post):
+    return post.pub_date, post.pk
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: разложенные посты из входящей ленты
+    k-way слиянием объединяются с постами знаменитостей,
+    которые читаются при запросе."""
+
+    def __init__(self, user, per_page):
+        self.celebrity_ids = list(celebrities_followed_by(user.pk))
+        self.inbox = user.timeline.select_related(
+            'post__author', 'post__group')
+        if self.celebrity_ids:
+            self.inbox = self.inbox.exclude(author_id__in=self.celebrity_ids)
+        super().__init__(
+            Post.objects.select_related('author', 'group')
+            .filter(author_id__in=self.celebrity_ids),
+            per_page,
+        )
+
+    def _fetch(self, direction, key, limit):
+        pushed = seek(self.inbox, direction, key, id_field='post_id')
+        sources = [[entry.post for entry in pushed[:limit]]]
+        # Отдельный запрос на каждого автора идёт по индексу
+        # (author, pub_date), а не сортирует общую выборку.
+        for author_id in self.celebrity_ids:
+            pulled = seek(
+                self.object_list.filter(author_id=author_id), direction, key)
+            sources.append(list(pulled[:limit]))
+        merged = heapq.merge(
+            *sources, key=_sort_key, reverse=direction == NEXT)
+        return list(islice(merged, limit))
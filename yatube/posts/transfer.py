@@ -0,0 +1,272 @@
+"""Потоковые выгрузка и загрузка таблиц в JSONL, по объекту на строку.
+
+Выгрузка идёт по возрастанию id через iterator() с чтением пачками,
+загрузка - пачками bulk_create, каждая в своей транзакции. Память
+не зависит от объёма данных. Загрузка сохраняет id, если он свободен,
+иначе строка получает новый; соответствие id записывается в
+ImportedRow, и ссылки других выгрузок переводятся по нему. Уже
+загруженные строки пропускаются, поэтому прерванную загрузку можно
+просто запустить снова (или с --skip, чтобы не читать готовое заново)."""
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import counters, feed_cache
+from .models import ImportedRow
+
+User = get_user_model()
+
+
+def last_id(path):
+    """id последней целиком записанной строки файла выгрузки."""
+    last = None
+    try:
+        with open(path, encoding='utf-8') as lines:
+            for line in lines:
+                if line.endswith('\n'):
+                    last = line
+    except FileNotFoundError:
+        return 0
+    return json.loads(last)['id'] if last else 0
+
+
+def drop_partial_line(path):
+    # Оборванная на полуслове строка не должна склеиться со следующей.
+    with open(path, 'rb+') as data:
+        content_end = data.seek(0, 2)
+        position = content_end
+        while position > 0:
+            data.seek(position - 1)
+            if data.read(1) == b'\n':
+                break
+            position -= 1
+        if position != content_end:
+            data.truncate(position)
+
+
+@contextmanager
+def keep_dates(model, *names):
+    """bulk_create не перезаписывает даты auto_now_add текущим временем:
+    загружаемые строки сохраняют даты из выгрузки."""
+    fields = [model._meta.get_field(name) for name in names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def lookup(model, field, values):
+    """Словарь значение -> id для пачки значений одним запросом."""
+    return dict(
+        model.objects.filter(**{f'{field}__in': set(values)})
+        .values_list(field, 'pk'))
+
+
+def targets(model, source_ids):
+    """Словарь id в выгрузке -> id в базе для уже загруженных строк."""
+    return dict(
+        ImportedRow.objects.filter(
+            model=model._meta.label_lower, source_id__in=set(source_ids))
+        .values_list('source_id', 'target_id'))
+
+
+def parse_date(value):
+    return parse_datetime(value) if value else None
+
+
+class Progress:
+    """Счётчик строк со скоростью в строках в секунду."""
+
+    def __init__(self, write):
+        self.write = write
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+    def add(self, count, note=''):
+        self.rows += count
+        self.write(f'{self.rows} строк, {self.rate:.0f} строк/с{note}')
+
+
+class ExportCommand(BaseCommand):
+    """Выгрузка модели: поле в JSONL -> путь для values_list."""
+    model = None
+    fields = {}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки, по умолчанию - стандартный вывод.')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Дописать файл, начиная после последнего id в нём.')
+
+    def handle(self, *args, **options):
+        path = options['output']
+        after = 0
+        if options['resume']:
+            if path == '-':
+                raise CommandError('--resume работает только с --output')
+            after = last_id(path)
+            if after:
+                drop_partial_line(path)
+        rows = (
+            self.model.objects.filter(pk__gt=after)
+            .order_by('pk')
+            .values_list(*self.fields.values())
+            .iterator(chunk_size=options['batch_size'])
+        )
+        names = tuple(self.fields)
+        # isoformat без округления до миллисекунд, как у DjangoJSONEncoder.
+        encoder = json.JSONEncoder(
+            ensure_ascii=False, default=lambda value: value.isoformat())
+        if path == '-':
+            output = None
+            write = partial(self.stdout.write, ending='')
+        else:
+            output = open(path, 'a' if after else 'w', encoding='utf-8')
+            write = output.write
+        progress = Progress(self.stderr.write)
+        try:
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                write(''.join(
+                    encoder.encode(dict(zip(names, row))) + '\n'
+                    for row in batch
+                ))
+                progress.add(len(batch))
+        finally:
+            if output is not None:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено {progress.rows} строк, {progress.rate:.0f} строк/с'))
+
+
+class ImportCommand(BaseCommand):
+    """Загрузка модели пачками. build() превращает пачку словарей
+    в объекты с id из выгрузки и отбрасывает строки, ссылающиеся
+    на то, чего нет; duplicates() находит среди них уже имеющиеся
+    в базе под другим id."""
+    model = None
+    date_fields = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию - стандартный ввод.')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Сколько строк вставлять одной транзакцией.')
+        parser.add_argument(
+            '--skip', type=int, default=0,
+            help='Пропустить столько первых строк, уже загруженных раньше.')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, индексы и ленты после '
+                 'загрузки, например если следом грузится ещё что-то.')
+
+    def build(self, rows):
+        raise NotImplementedError
+
+    def duplicates(self, objects):
+        return []
+
+    def rebuild(self):
+        """Пересчёт того, что обычно поддерживают сигналы модели."""
+        counters.reconcile()
+        feed_cache.bump(feed_cache.ALL)
+
+    def handle(self, *args, **options):
+        path = options['input']
+        source = (
+            sys.stdin if path == '-' else open(path, encoding='utf-8'))
+        lines = islice(source, options['skip'], None)
+        progress = Progress(self.stderr.write)
+        self.counts = Counter()
+        line_number = options['skip']
+        try:
+            with keep_dates(self.model, *self.date_fields):
+                while True:
+                    chunk = list(islice(lines, options['batch_size']))
+                    if not chunk:
+                        break
+                    line_number += len(chunk)
+                    batch = [json.loads(line) for line in chunk
+                             if line.strip()]
+                    self.load(batch)
+                    progress.add(
+                        len(batch), f', дальше с --skip {line_number}')
+        finally:
+            if path != '-':
+                source.close()
+        self.reset_sequences()
+        if not options['no_rebuild']:
+            self.stderr.write('Пересчёт производных данных...')
+            self.rebuild()
+        counts = self.counts
+        self.stderr.write(self.style.SUCCESS(
+            f'Загружено {counts["loaded"]} строк, из них под новым id: '
+            f'{counts["remapped"]}, {progress.rate:.0f} строк/с'))
+        self.stderr.write(
+            f'Пропущено: загружены раньше - {counts["known"]}, '
+            f'уже есть в базе - {counts["duplicates"]}, '
+            f'без пары в базе - {counts["orphans"]}')
+
+    def load(self, rows):
+        """Загружает пачку одной транзакцией. Строка, чей id в базе
+        занят, получает новый id: bulk_create в SQLite не возвращает
+        id, поэтому такие строки сохраняются по одной."""
+        label = self.model._meta.label_lower
+        known = targets(self.model, (row['id'] for row in rows))
+        rows = [row for row in rows if row['id'] not in known]
+        objects = self.build(rows)
+        duplicates = self.duplicates(objects)
+        objects = [obj for obj in objects if obj not in duplicates]
+        sources = [obj.pk for obj in objects]
+        with transaction.atomic():
+            taken = set(
+                self.model.objects.filter(pk__in=sources)
+                .values_list('pk', flat=True))
+            self.model.objects.bulk_create(
+                [obj for obj in objects if obj.pk not in taken])
+            for obj in objects:
+                if obj.pk in taken:
+                    obj.pk = None
+                    # raw: производные данные пересчитает rebuild().
+                    obj.save_base(raw=True, force_insert=True)
+            ImportedRow.objects.bulk_create(
+                ImportedRow(model=label, source_id=source, target_id=obj.pk)
+                for source, obj in zip(sources, objects))
+        self.counts.update(
+            loaded=len(objects), remapped=len(taken), known=len(known),
+            duplicates=len(duplicates),
+            orphans=len(rows) - len(objects) - len(duplicates))
+
+    def reset_sequences(self):
+        # Строки пришли со своими id: счётчик id в PostgreSQL сдвигается.
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [self.model])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
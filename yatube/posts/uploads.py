@@ -0,0 +1,98 @@
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+ORIENTATION = 0x0112
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемый файл кусками во временный файл, минуя память.
+    Всё, что сверх settings.POST_IMAGE_MAX_BYTES, не сохраняется:
+    файл помечается как обрезанный, и форма его отклоняет
+    (см. PostImageFormMixin: его используют и сайт, и админка)."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.POST_IMAGE_MAX_BYTES:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = min(file_size, settings.POST_IMAGE_MAX_BYTES)
+        self.file.truncated = file_size > settings.POST_IMAGE_MAX_BYTES
+        return self.file
+
+
+def check_size(upload):
+    limit = settings.POST_IMAGE_MAX_BYTES
+    if getattr(upload, 'truncated', False) or upload.size > limit:
+        raise ValidationError(
+            f'Файл больше {limit / 2 ** 20:g} МБ.', code='file_too_large')
+
+
+def check_header(upload):
+    """Проверяет размер, формат и число пикселей по заголовку файла,
+    ничего не декодируя. Возвращает формат картинки."""
+    check_size(upload)
+    upload.seek(0)
+    try:
+        # Image.open читает только заголовок.
+        with Image.open(upload) as image:
+            format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        format, width, height = None, 0, settings.POST_IMAGE_MAX_PIXELS + 1
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка больше {settings.POST_IMAGE_MAX_PIXELS} пикселей.',
+            code='too_many_pixels')
+    if format not in settings.POST_IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Поддерживаются форматы: '
+            f'{", ".join(settings.POST_IMAGE_UPLOAD_FORMATS)}.',
+            code='unsupported_format')
+    return format
+
+
+def transcode(upload, format):
+    """Пересохраняет картинку без EXIF и прочих метаданных,
+    уменьшая её до settings.POST_IMAGE_MAX_SIDE по большей стороне.
+    JPEG декодируется сразу в уменьшенном масштабе (draft), так что
+    в памяти не бывает полноразмерного растра большой фотографии.
+    Анимированные картинки сохраняются как есть: кадры не теряются."""
+    upload.seek(0)
+    side = settings.POST_IMAGE_MAX_SIDE
+    with Image.open(upload) as image:
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        width, height = image.size
+        scale = min(1, side / max(width, height))
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if format == 'JPEG':
+            # Декодер выберет наименьший масштаб 1/2..1/8 не меньше target.
+            image.draft('RGB', target)
+        # Поворот из EXIF применяем до того, как EXIF пропадёт;
+        # без поворота exif_transpose лишь копирует растр.
+        if image.getexif().get(ORIENTATION, 1) != 1:
+            image = ImageOps.exif_transpose(image)
+        image.thumbnail(target)
+        result = TemporaryUploadedFile(
+            upload.name, upload.content_type, 0, None)
+        options = {'quality': 90} if format in ('JPEG', 'WEBP') else {}
+        image.save(result, format, **options)
+    result.size = os.fstat(result.fileno()).st_size
+    result.seek(0)
+    return result
+
+
+def process_image(upload):
+    """Проверяет загруженную картинку и возвращает её очищенную копию."""
+    return transcode(upload, check_header(upload))
@@ -1,8 +1,126 @@
+import base64
+import binascii
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, *key):
+    """Токен курсора: направление и части ключа последней записи."""
+    raw = '|'.join([direction, *map(str, key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def split_cursor(token):
+    """Токен -> (направление, [части ключа]) или None, если токен
+    испорчен."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    direction, *key = raw.split('|')
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, key
+
+
+def decode_cursor(token):
+    """Разбирает токен в (направление, ключ (дата, id)).
+    На испорченный токен возвращает None - отдаём первую страницу."""
+    cursor = split_cursor(token)
+    if cursor is None:
+        return None
+    direction, key = cursor
+    if not key:
+        return direction, None
+    if len(key) != 2:
+        return None
+    date, pk = key
+    try:
+        date = parse_datetime(date)
+    except ValueError:
+        return None
+    if date is None or not pk.isdigit():
+        return None
+    return direction, (date, int(pk))
+
+
+def seek(queryset, direction, key, date_field='pub_date', id_field='pk'):
+    """Сортирует выборку по ключу (дата, id) в сторону direction
+    и отбрасывает всё, что лежит до курсора key."""
+    ordering = (f'-{date_field}', f'-{id_field}')
+    lookup = 'lt'
+    if direction == PREVIOUS:
+        # Идём к более свежим записям: порядок по возрастанию.
+        ordering = (date_field, id_field)
+        lookup = 'gt'
+    queryset = queryset.order_by(*ordering)
+    if key is not None:
+        date, pk = key
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}': date})
+            | Q(**{date_field: date, f'{id_field}__{lookup}': pk})
+        )
+    return queryset
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (дата, id).
+    Соседние страницы ищутся по индексу, без COUNT(*) и OFFSET,
+    поэтому глубокие страницы открываются так же быстро, как первая."""
+
+    def __init__(self, object_list, per_page, date_field='pub_date',
+                 id_field='pk'):
+        self.date_field = date_field
+        self.id_field = id_field
+        super().__init__(
+            object_list.order_by(f'-{date_field}', f'-{id_field}'), per_page)
+
+    def _fetch(self, direction, key, limit):
+        return list(seek(
+            self.object_list, direction, key, self.date_field, self.id_field
+        )[:limit])
+
+    def _encode(self, direction, obj=None):
+        if obj is None:
+            return encode_cursor(direction)
+        return encode_cursor(
+            direction, getattr(obj, self.date_field).isoformat(),
+            getattr(obj, self.id_field))
+
+    def get_page(self, cursor):
+        direction, key = decode_cursor(cursor) or (NEXT, None)
+        # Лишняя запись говорит о том, есть ли что-то дальше.
+        items = self._fetch(direction, key, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == PREVIOUS:
+            items.reverse()
+            has_previous, has_next = has_more, key is not None
+        else:
+            has_previous, has_next = key is not None, has_more
+        page = Page(items, 1, self)
+        page.previous_cursor = (
+            self._encode(PREVIOUS, items[0])
+            if has_previous and items else None
+        )
+        page.next_cursor = (
+            self._encode(NEXT, items[-1]) if has_next and items else None
+        )
+        page.last_cursor = self._encode(PREVIOUS) if has_next else None
+        return page
 
 
-def paginator(request, post_list):
-    paginator = Paginator(post_list, settings.COUNT_POSTS)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def paginator(request, object_list, date_field='pub_date', per_page=None):
+    paginator = CursorPaginator(
+        object_list, per_page or settings.COUNT_POSTS, date_field)
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
@@ -1,29 +1,49 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 from django.contrib.auth.models import User
 
+from . import search, tags, thumbnails
+from .counters import stats_for
+from .feed_cache import cache_feed, lazy_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginator
+from .models import Follow, Group, Post, Tag, User
+from .timeline import TimelinePaginator
+from .utils import CURSOR_PARAM, paginator
 
 
-@cache_page(15)
+@cache_feed('index')
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
     context = {
-        'page_obj': paginator(request, post_list),
+        'page_obj': lazy_page(request, post_list),
     }
     return render(request, 'posts/index.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search.SearchPaginator(
+            query, settings.COUNT_POSTS
+        ).get_page(request.GET.get(CURSOR_PARAM))
+        thumbnails.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def follow_index(request):
-    post_list = (
-        Post.objects.select_related()
-        .filter(author__following__user=request.user)
-    )
-    context = {'page_obj': paginator(request, post_list), }
+    timeline = TimelinePaginator(request.user, settings.COUNT_POSTS)
+    page_obj = timeline.get_page(request.GET.get(CURSOR_PARAM))
+    thumbnails.prefetch(page_obj)
+    context = {
+        'page_obj': page_obj,
+    }
     return render(request, 'posts/follow.html', context)
 
 
@@ -47,42 +67,79 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@cache_feed('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author')
     context = {
-        'page_obj': paginator(request, post_list),
+        'page_obj': lazy_page(request, post_list),
         'group': group,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    page_obj = tags.TagPaginator(tag, settings.COUNT_POSTS).get_page(
+        request.GET.get(CURSOR_PARAM))
+    thumbnails.prefetch(page_obj)
+    context = {
+        'page_obj': page_obj,
+        'tag': tag,
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
+@cache_feed('profile:{username}')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     post_list = author.posts.select_related('group')
-    count_post_author = len(post_list)
+    stats = stats_for(author)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
         'author': author,
-        'page_obj': paginator(request, post_list),
-        'count_post_author': count_post_author,
+        'page_obj': lazy_page(request, post_list),
+        'count_post_author': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    thumbnails.prefetch([post])
     form = CommentForm(request.POST or None,)
     context = {
         'post': post,
         'form': form,
-        'comments': post.comments.all(),
+        'comments': comments_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом для "Показать ещё"."""
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def comments_page(request, post):
+    return paginator(
+        request,
+        post.comments.select_related('author'),
+        date_field='created',
+        per_page=settings.COUNT_COMMENTS,
+    )
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -100,8 +157,10 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
+    # Автор нужен сигналу сохранения для сброса кэша его профиля.
+    post = get_object_or_404(
+        Post.objects.select_related('author'), pk=post_id)
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -0,0 +1,81 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from . import stacks
+from .models import RequestProfile
+
+
+def folded_response(text, filename):
+    response = HttpResponse(text, content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Профили только смотрят и скачивают: стеки открываются
+    в speedscope.app или превращаются в SVG через flamegraph.pl."""
+
+    list_display = (
+        'created', 'url_name', 'method', 'path', 'status', 'duration',
+        'user')
+    list_filter = ('url_name',)
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    date_hierarchy = 'created'
+    fields = (
+        'created', 'url_name', 'method', 'path', 'status', 'duration',
+        'user', 'download', 'hottest')
+    readonly_fields = fields
+    actions = ('download_merged',)
+
+    def get_queryset(self, request):
+        # Стеки бывают по сотне килобайт, в списке они не нужны.
+        return super().get_queryset(request).defer('stacks')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/stacks/',
+                self.admin_site.admin_view(self.stacks_view),
+                name='profiling_requestprofile_stacks'),
+        ] + super().get_urls()
+
+    def stacks_view(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        name = profile.url_name.replace(':', '-') or 'request'
+        return folded_response(
+            profile.stacks, f'{name}-{profile.created:%Y%m%d-%H%M%S}.folded')
+
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">Свёрнутые стеки для flame graph</a>',
+            reverse('admin:profiling_requestprofile_stacks', args=(obj.pk,)))
+    download.short_description = 'Скачать'
+
+    def hottest(self, obj):
+        frames = stacks.hottest(stacks.loads(obj.stacks))
+        return format_html(
+            '<table>{}</table>',
+            format_html_join(
+                '', '<tr><td>{} мс</td><td>{}</td></tr>',
+                ((f'{count / 1000:.1f}', frame) for frame, count in frames)))
+    hottest.short_description = 'Больше всего собственного времени'
+
+    def download_merged(self, request, queryset):
+        merged = stacks.merge(queryset.values_list('stacks', flat=True))
+        return folded_response(stacks.dumps(merged), 'profiles.folded')
+    download_merged.short_description = 'Скачать стеки выбранных вместе'
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,55 @@
+import cProfile
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import stacks
+from .models import RequestProfile
+
+
+class ProfilingMiddleware:
+    """Снимает профиль cProfile с view и отрисовки шаблона: для
+    сотрудников, добавивших к адресу ?PROFILING_PARAM, и для доли
+    PROFILING_SAMPLE_RATE остальных запросов. Свёрнутые стеки
+    сохраняются в RequestProfile и смотрятся в админке.
+
+    При PROFILING_ENABLED = False Django убирает middleware из цепочки
+    ещё при запуске, и запросы через неё не проходят вовсе."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def wanted(self, request):
+        if settings.PROFILING_PARAM in request.GET:
+            return request.user.is_staff
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        duration = time.perf_counter() - started
+        # Этот INSERT - лишний запрос сверх бюджета view.
+        request.profiled = True
+        match = request.resolver_match
+        RequestProfile.objects.create(
+            url_name=match.view_name if match else '',
+            method=request.method,
+            path=request.get_full_path(),
+            user=request.user if request.user.is_authenticated else None,
+            status=response.status_code,
+            duration=duration * 1000,
+            stacks=stacks.dumps(
+                stacks.collapse(profile, self.get_response)),
+        )
+        return response
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class RequestProfile(models.Model):
+    url_name = models.CharField('Имя URL', max_length=200, blank=True)
+    method = models.CharField('Метод', max_length=10)
+    path = models.TextField('Адрес')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пользователь',
+    )
+    status = models.PositiveSmallIntegerField('Код ответа')
+    duration = models.FloatField('Время, мс')
+    stacks = models.TextField(
+        'Стеки',
+        help_text='Свёрнутые стеки: "функция;функция;... микросекунды", '
+                  'по строке на путь вызовов'
+    )
+    created = models.DateTimeField('Снят', default=timezone.now)
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        indexes = [
+            models.Index(
+                fields=['url_name', 'created'],
+                name='profile_url_created_idx'),
+            models.Index(fields=['created'], name='profile_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.url_name or self.path} {self.created:%Y-%m-%d %H:%M:%S}'
@@ -0,0 +1,115 @@
+"""Свёрнутые стеки (формат flamegraph.pl, speedscope, inferno)
+из статистики cProfile.
+
+cProfile хранит не стеки, а граф вызовов: для каждой функции - её
+собственное и полное время и время, проведённое в ней из каждого
+вызывающего. Стеки восстанавливаются обходом графа от корней: время
+вызываемой функции делится между путями пропорционально времени
+рёбер. Для функций, которые зовут из разных мест, это приближение,
+но для поиска медленного места его хватает."""
+import cProfile
+import os
+import pstats
+import sys
+from collections import Counter
+
+# Единица счётчиков - микросекунды: flamegraph.pl ждёт целые числа.
+UNIT = 1e-6
+MAX_DEPTH = 200
+
+
+def _prefixes():
+    return sorted(
+        (os.path.join(path, '') for path in sys.path if path),
+        key=len, reverse=True)
+
+
+def label(func, prefixes=()):
+    filename, line, name = func
+    if filename == '~':
+        # Встроенные функции: '<built-in method builtins.len>'.
+        name = name.strip('<>')
+    else:
+        for prefix in prefixes:
+            if filename.startswith(prefix):
+                filename = filename[len(prefix):]
+                break
+        name = f'{name} ({filename}:{line})'
+    # ';' разделяет кадры, пробел отделяет счётчик.
+    return name.replace(';', ',')
+
+
+def _key(function):
+    code = getattr(function, '__code__', None)
+    if code is None:
+        code = type(function).__call__.__code__
+    return cProfile.label(code)
+
+
+def collapse(profile, root=None):
+    """Профиль cProfile.Profile -> Counter{'кадр;кадр;...': мкс}.
+
+    Корни - функции без вызывающих. Если профиль снят вокруг вызова
+    root, его нужно передать явно: у него могут быть и вызывающие
+    внутри профиля, как у обёртки, в которую Django заворачивает
+    каждую middleware."""
+    stats = pstats.Stats(profile).stats
+    callees = {func: [] for func in stats}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            if caller in callees:
+                callees[caller].append((func, edge[3]))
+    prefixes = _prefixes()
+    labels = {func: label(func, prefixes) for func in stats}
+    stacks = Counter()
+
+    def walk(func, share, path, seen):
+        _, _, own, total, _ = stats[func]
+        path = f'{path};{labels[func]}' if path else labels[func]
+        ratio = share / total if total else 0
+        stacks[path] += own * ratio / UNIT
+        if len(seen) >= MAX_DEPTH:
+            return
+        seen = seen | {func}
+        for callee, edge in callees[func]:
+            # Рекурсия учтена во времени вызывающего.
+            if callee not in seen and edge * ratio >= UNIT:
+                walk(callee, edge * ratio, path, seen)
+
+    roots = [func for func, stat in stats.items() if not stat[4]]
+    if root is not None and _key(root) in stats:
+        roots.append(_key(root))
+    for func in roots:
+        walk(func, stats[func][3], '', frozenset())
+    return stacks
+
+
+def dumps(stacks):
+    return ''.join(
+        f'{stack} {round(count)}\n'
+        for stack, count in sorted(stacks.items()) if round(count) > 0)
+
+
+def loads(text):
+    stacks = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+
+def merge(texts):
+    """Сумма нескольких профилей: общая картина по многим запросам."""
+    merged = Counter()
+    for text in texts:
+        merged.update(loads(text))
+    return merged
+
+
+def hottest(stacks, limit=20):
+    """Функции с наибольшим собственным временем: [(кадр, мкс)]."""
+    frames = Counter()
+    for stack, count in stacks.items():
+        frames[stack.rpartition(';')[2]] += count
+    return frames.most_common(limit)
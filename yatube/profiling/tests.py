@@ -0,0 +1,135 @@
+import cProfile
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from . import stacks
+from .middleware import ProfilingMiddleware
+from .models import RequestProfile
+
+User = get_user_model()
+
+
+def inner():
+    return sum(range(20000))
+
+
+def outer():
+    return [inner() for _ in range(5)]
+
+
+class StacksTests(TestCase):
+    def test_collapse(self):
+        """Стеки повторяют путь вызовов, а время inner целиком
+        приходится на путь через outer."""
+        profile = cProfile.Profile()
+        profile.runcall(outer)
+        collapsed = stacks.collapse(profile)
+        names = [
+            [frame.split(' ')[0] for frame in stack.split(';')]
+            for stack in collapsed]
+        self.assertIn(['outer', '<listcomp>', 'inner'], names)
+        self.assertIn(
+            'profiling/tests.py:', next(iter(collapsed)).split(';')[0])
+        self.assertEqual(stacks.loads(stacks.dumps(collapsed)), Counter(
+            {stack: round(count) for stack, count in collapsed.items()
+             if round(count)}))
+
+    def test_merge_and_hottest(self):
+        merged = stacks.merge(['a;b 10\na;c 5\n', 'a;b 1\nd;c 7\n'])
+        self.assertEqual(merged, {'a;b': 11, 'a;c': 5, 'd;c': 7})
+        self.assertEqual(stacks.hottest(merged, 1), [('c', 12)])
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.user = User.objects.create_user(username='user')
+        Post.objects.create(text='Пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Выключенная middleware не попадает в цепочку."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
+
+    def test_staff(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('posts:index'), {'profile': ''})
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.url_name, 'posts:index')
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.status, 200)
+        self.assertIn('index (posts/views.py:', profile.stacks)
+        self.assertIn('render', profile.stacks)
+
+    def test_not_staff(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:index'), {'profile': ''})
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            RequestProfile.objects.get().url_name, 'posts:index')
+
+
+class RequestProfileAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='x')
+        cls.profile = RequestProfile.objects.create(
+            url_name='posts:index', method='GET', path='/', status=200,
+            duration=12.5, stacks='view;render 1500\nview;query 500\n')
+        RequestProfile.objects.create(
+            url_name='posts:profile', method='GET', path='/profile/a/',
+            status=200, duration=3, stacks='view;query 700\n')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_browse(self):
+        response = self.client.get(
+            reverse('admin:profiling_requestprofile_changelist'))
+        self.assertContains(response, 'posts:profile')
+        response = self.client.get(reverse(
+            'admin:profiling_requestprofile_change',
+            args=(self.profile.pk,)))
+        self.assertContains(response, '1.5 мс')
+        self.assertContains(response, reverse(
+            'admin:profiling_requestprofile_stacks',
+            args=(self.profile.pk,)))
+
+    def test_download(self):
+        response = self.client.get(reverse(
+            'admin:profiling_requestprofile_stacks', args=(self.profile.pk,)))
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(response.content.decode(), self.profile.stacks)
+
+    def test_download_merged(self):
+        response = self.client.post(
+            reverse('admin:profiling_requestprofile_changelist'), {
+                'action': 'download_merged',
+                '_selected_action': list(
+                    RequestProfile.objects.values_list('pk', flat=True)),
+            })
+        self.assertEqual(
+            response.content.decode(),
+            'view;query 1200\nview;render 1500\n')
@@ -1,6 +1,9 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
 
+from jobs.queue import enqueue
+
+from .tasks import send_password_reset
 
 User = get_user_model()
 
@@ -9,3 +12,23 @@ class CreationForm(UserCreationForm):
     class Meta:
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо для сброса пароля отрисовывается и отправляется фоновой
+    задачей. В очередь попадает только id пользователя: токен и ссылка
+    создаются в задаче и не хранятся в БД."""
+
+    # Эти значения задача вычисляет сама по пользователю.
+    USER_CONTEXT = ('email', 'user', 'uid', 'token')
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        user = context['user']
+        context = {
+            key: value for key, value in context.items()
+            if key not in self.USER_CONTEXT}
+        enqueue(
+            send_password_reset, user.pk, context, subject_template_name,
+            email_template_name, from_email, html_email_template_name)
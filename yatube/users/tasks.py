@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+User = get_user_model()
+
+
+def send_mail(subject, body, from_email, to, html_body=None):
+    """Фоновая задача: отправляет уже отрисованное письмо."""
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body is not None:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
+
+
+def send_password_reset(user_pk, context, subject_template_name,
+                        email_template_name, from_email,
+                        html_email_template_name=None):
+    """Фоновая задача: отрисовывает и отправляет письмо для сброса
+    пароля. Ссылка с токеном создаётся только здесь, чтобы не попасть
+    в аргументы задачи в БД."""
+    user = User.objects.filter(pk=user_pk, is_active=True).first()
+    if user is None:
+        return
+    context = {
+        **context,
+        'email': user.email,
+        'user': user,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    }
+    subject = loader.render_to_string(subject_template_name, context)
+    subject = ''.join(subject.splitlines())
+    body = loader.render_to_string(email_template_name, context)
+    html_body = None
+    if html_email_template_name is not None:
+        html_body = loader.render_to_string(
+            html_email_template_name, context)
+    send_mail(subject, body, from_email, [user.email], html_body)
@@ -6,6 +6,7 @@ from django.contrib.auth.views import (
 from django.urls import path
 
 from . import views
+from .forms import QueuedPasswordResetForm
 
 app_name = 'users'
 
@@ -34,7 +35,8 @@ urlpatterns = [
     path(
         'password_reset/',
         PasswordResetView.as_view(
-            template_name='users/password_reset_form.html')
+            template_name='users/password_reset_form.html',
+            form_class=QueuedPasswordResetForm)
     ),
     path(
         'password_reset/done/',
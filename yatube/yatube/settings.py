@@ -26,15 +26,21 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'jobs.apps.JobsConfig',
+    'profiling.apps.ProfilingConfig',
+    'metrics.apps.MetricsConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'profiling.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -43,7 +49,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'metrics.template.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -101,6 +107,16 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 COUNT_POSTS = 10
+# Больше стольких строк админка не считает точно, а берёт оценку СУБД.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+COUNT_COMMENTS = 20
+
+# Посты авторов, у которых подписчиков не меньше этого числа,
+# не раскладываются по лентам, а подтягиваются при чтении.
+# Ленты следят только за переходом счётчика через порог: после
+# изменения числа их нужно пересобрать командой rebuild_timelines.
+TIMELINE_CELEBRITY_FOLLOWERS = 1000
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -111,11 +127,101 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Загрузки сразу пишутся во временный файл кусками по 64 КБ,
+# а всё сверх POST_IMAGE_MAX_BYTES отбрасывается.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedUploadHandler']
+# Пределы для картинок постов. Число пикселей проверяется по
+# заголовку до декодирования и ограничивает память на одну загрузку.
+POST_IMAGE_MAX_BYTES = 20 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Картинка уменьшается до этого размера по большей стороне.
+POST_IMAGE_MAX_SIDE = 2560
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры картинок постов: имя -> (геометрия, опции sorl-thumbnail).
+# Все они строятся заранее, фоновой задачей после сохранения поста.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Варианты картинки карточки для <picture>: ширины для srcset
+# и форматы от лучшего сжатия к запасному. Формат, который
+# установленный Pillow не умеет сохранять (AVIF без
+# pillow-avif-plugin), пропускается.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(max-width: 992px) 100vw, 960px'
+# Ширина превью-заглушки в пикселях, высота - по пропорциям карточки.
+POST_IMAGE_PLACEHOLDER_WIDTH = 16
+# Сведения о миниатюрах: кэш с записью в БД и предзагрузкой
+# всех миниатюр страницы ленты одним запросом к кэшу.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+# Фоновые задачи: очередь в БД, выполняет manage.py runworker.
+# При JOBS_EAGER задачи выполняются сразу, без очереди и воркера.
+JOBS_EAGER = False
+JOB_WORKERS = 4
+JOB_MAX_ATTEMPTS = 5
+# Пауза перед первым повтором, секунды; дальше удваивается.
+JOB_RETRY_BACKOFF = 30
+JOB_POLL_INTERVAL = 1
+# Задача, взятая в работу раньше, считается брошенной умершим воркером.
+JOB_LOCK_TIMEOUT = 600
+# Сколько дней хранятся выполненные и упавшие задачи; runworker
+# удаляет более старые не чаще раза в JOB_PURGE_INTERVAL секунд.
+JOB_RETENTION_DAYS = 7
+JOB_PURGE_INTERVAL = 60 * 60
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'metrics.cache.LocMemCache',
     }
 }
+# Ленты сбрасываются сигналами при изменении постов, групп и имён
+# авторов, а срок жизни страхует от изменений в обход сигналов.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Сколько SQL-запросов разрешено каждой view. При превышении
+# QueryBudgetMiddleware пишет предупреждение или, если
+# QUERY_BUDGET_RAISE включён, падает с ошибкой.
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_posts': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 6,
+    'posts:post_comments': 4,
+    'posts:follow_index': 6,
+    'posts:post_search': 5,
+    'posts:tag_posts': 4,
+    # Замерено на самом дорогом пути: загрузка картинки, новый тег,
+    # а при правке ещё замена картинки и смена группы.
+    'posts:post_create': 19,
+    'posts:post_edit': 22,
+    'posts:add_comment': 10,
+    'posts:profile_follow': 16,
+    'posts:profile_unfollow': 12,
+}
+QUERY_BUDGET_RAISE = False
+
+# Профилирование запросов cProfile. Выключенная ProfilingMiddleware
+# убирается из цепочки middleware и ничего не стоит. Включённая
+# профилирует запросы сотрудников с ?PROFILING_PARAM в адресе
+# и долю PROFILING_SAMPLE_RATE всех запросов.
+PROFILING_ENABLED = False
+PROFILING_PARAM = 'profile'
+PROFILING_SAMPLE_RATE = 0.0
+
+# Метрики для Prometheus на /metrics. Каждый процесс пишет значения
+# в свой файл в METRICS_DIR, /metrics складывает все файлы. Перед
+# запуском воркеров каталог очищают командой reset_metrics.
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(BASE_DIR, 'var', 'metrics'))
+# Prometheus передаёт токен в заголовке Authorization:
+#   authorization:
+#     credentials_file: /etc/prometheus/yatube-token
+# Пустой токен отключает /metrics. Снаружи адрес лучше закрыть и
+# в прокси (location /metrics { deny all; }), а Prometheus пускать
+# к gunicorn напрямую по внутренней сети.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')